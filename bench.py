@@ -0,0 +1,396 @@
+# coding: utf-8
+"""
+Benchmarks for the hot paths of the DIContainer.
+
+Run all benchmarks and print the results::
+
+    python bench.py
+
+The memory benchmarks report the bytes retained per configuration
+(python 3.4+, using tracemalloc).
+
+Store the results as baseline and compare a later run against it::
+
+    python bench.py --output baseline.json
+    python bench.py --compare baseline.json
+
+The comparison exits with status 1 if a benchmark got slower than the
+allowed threshold.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import gc
+import sys
+import json
+import timeit
+import argparse
+import platform
+
+from collections import OrderedDict
+
+import di
+
+from di import DIContainer
+
+
+class Service(object):
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+
+class ServiceMixin(object):
+    pass
+
+
+class OtherMixin(object):
+    pass
+
+
+def path(type_name):
+    """
+    Returns the python path of a type of this module. Works if this
+    module runs as script, too.
+    """
+    return '%s.%s' % (__name__, type_name)
+
+
+def filler_settings(size):
+    """
+    Returns `size` unrelated configurations, so the benchmarks run
+    against registries of different sizes.
+    """
+    settings = OrderedDict()
+    for i in range(size):
+        settings['filler_%s' % i] = {
+            'type': path('Service'),
+            'alias': ['filler_alias_%s' % i],
+        }
+    return settings
+
+
+def bench_singleton_hit(size):
+    settings = filler_settings(size)
+    settings['singleton'] = {'type': path('Service'), 'singleton': True}
+    container = DIContainer(settings)
+    container.resolve('singleton')
+    return lambda: container.resolve('singleton')
+
+
+def bench_transient(size):
+    settings = filler_settings(size)
+    settings['transient'] = {
+        'type': path('Service'),
+        'args': ['value', 1],
+        'kwargs': {'module': 'mod:sys'},
+        'properties': {'name': 'transient'},
+    }
+    container = DIContainer(settings)
+    return lambda: container.resolve('transient')
+
+
+def bench_relation_chain(size, depth=10):
+    settings = filler_settings(size)
+    settings['chain_0'] = {'type': path('Service')}
+    for i in range(1, depth):
+        settings['chain_%s' % i] = {
+            'type': path('Service'),
+            'kwargs': {'parent': di.RelationResolver('chain_%s' % (i - 1))},
+            'properties': {'root': 'rel:chain_0'},
+        }
+    container = DIContainer(settings)
+    name = 'chain_%s' % (depth - 1)
+    return lambda: container.resolve(name)
+
+
+def bench_alias(size):
+    settings = filler_settings(size)
+    settings['aliased'] = {'type': path('Service'), 'alias': ['the_alias']}
+    container = DIContainer(settings)
+    return lambda: container.resolve('the_alias')
+
+
+def bench_mixins(size):
+    settings = filler_settings(size)
+    settings['mixed'] = {
+        'type': path('Service'),
+        'mixins': [path('ServiceMixin'), path('OtherMixin')],
+    }
+    container = DIContainer(settings)
+    return lambda: container.resolve('mixed')
+
+
+def bench_resolve_many(size):
+    settings = filler_settings(size)
+    settings['mixed'] = {
+        'type': path('Service'), 'mixins': [path('ServiceMixin')]}
+    container = DIContainer(settings)
+    return lambda: list(container.resolve_many(ServiceMixin))
+
+
+def bench_resolve_by_type(size):
+    settings = filler_settings(size)
+    settings['mixed'] = {
+        'type': path('Service'), 'mixins': [path('ServiceMixin')]}
+    container = DIContainer(settings)
+    return lambda: container.resolve(ServiceMixin)
+
+
+def bench_lazy_proxy(size):
+    settings = filler_settings(size)
+    settings['lazy'] = {'type': path('Service'), 'properties': {'x': 1}}
+    container = DIContainer(settings)
+    # make sure a proxy type is available.
+    container.get_proxy_type()
+
+    def run():
+        return container.resolve_lazy('lazy').x
+    return run
+
+
+def bench_child_container(size):
+    container = DIContainer(filler_settings(size))
+
+    def run():
+        child = container.create_child_container(
+            {'override': {'type': path('Service')}})
+        child.resolve('override')
+        return child.resolve('filler_0')
+    return run
+
+
+def bench_create_child_container(size):
+    container = DIContainer(filler_settings(size))
+    return lambda: container.create_child_container(
+        {'override': {'type': path('Service')}})
+
+
+def bench_inject(size):
+    settings = filler_settings(size)
+    settings['service'] = {'type': path('Service'), 'singleton': True}
+    container = DIContainer(settings)
+
+    @container.inject(service='service')
+    def view(request, service):
+        return service
+
+    return lambda: view('request')
+
+
+def bench_inject_default_container(size):
+    settings = filler_settings(size)
+    settings['service'] = {'type': path('Service'), 'singleton': True}
+    container = DIContainer(settings)
+    di.set_default_container(container)
+
+    @di.inject(service='service')
+    def view(request, service):
+        return service
+
+    return lambda: view('request')
+
+
+def bench_build_up(size):
+    settings = filler_settings(size)
+    settings['target'] = {
+        'type': path('Service'),
+        'properties': {'a': 1, 'b': 'rel:filler_0'},
+    }
+    container = DIContainer(settings)
+    instance = Service()
+    return lambda: container.build_up('target', instance)
+
+
+def memory_registry(size):
+    """
+    Returns a function creating the settings of `size` configurations
+    like they are loaded from a json file - each string is a separate
+    object - and wrapping them into a `DIConfigManager`.
+    """
+    data = json.dumps(OrderedDict(
+        ('config_%s' % i, {
+            'type': path('Service'),
+            'args': ['rel:config_0'],
+            'kwargs': {},
+            'properties': {},
+            'alias': ['config_alias_%s' % i],
+        }) for i in range(size)))
+    return lambda: di.DIConfigManager(json.loads(data))
+
+
+def memory_container(size):
+    """
+    Like `memory_registry`, but creates a whole container.
+    """
+    create_settings = memory_registry(size)
+    return lambda: DIContainer(create_settings())
+
+
+MEMORY_BENCHMARKS = OrderedDict((
+    ('registry_memory', memory_registry),
+    ('container_memory', memory_container),
+))
+
+
+BENCHMARKS = OrderedDict((
+    ('singleton_hit', bench_singleton_hit),
+    ('transient', bench_transient),
+    ('relation_chain', bench_relation_chain),
+    ('alias', bench_alias),
+    ('mixins', bench_mixins),
+    ('resolve_many', bench_resolve_many),
+    ('resolve_by_type', bench_resolve_by_type),
+    ('lazy_proxy', bench_lazy_proxy),
+    ('child_container', bench_child_container),
+    ('create_child_container', bench_create_child_container),
+    ('inject', bench_inject),
+    ('inject_default_container', bench_inject_default_container),
+    ('build_up', bench_build_up),
+))
+
+
+def measure(func, number, repeat):
+    """
+    Returns the timings of `func` in microseconds per call.
+    """
+    timings = timeit.Timer(func).repeat(repeat=repeat, number=number)
+    per_call = [timing / number * 1e6 for timing in timings]
+    return OrderedDict((
+        ('min_us', min(per_call)),
+        ('mean_us', sum(per_call) / len(per_call)),
+        ('number', number),
+        ('repeat', repeat),
+    ))
+
+
+def measure_memory(func, size):
+    """
+    Returns the bytes retained and allocated at most per configuration
+    by the object `func` creates.
+    """
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return OrderedDict((
+        ('bytes_per_config', float(current) / size),
+        ('peak_bytes_per_config', float(peak) / size),
+    ))
+
+
+def run(names, sizes, number, repeat):
+    results = OrderedDict()
+    memory = OrderedDict()
+    skipped = OrderedDict()
+    for name in names:
+        for size in sizes:
+            key = '%s[%s]' % (name, size)
+            if name in MEMORY_BENCHMARKS:
+                try:
+                    memory[key] = measure_memory(
+                        MEMORY_BENCHMARKS[name](size), size)
+                except Exception as error:
+                    # i.e. no tracemalloc before python 3.4.
+                    print('skipped %s: %r' % (key, error), file=sys.stderr)
+                    skipped[key] = repr(error)
+                continue
+            try:
+                func = BENCHMARKS[name](size)
+                func()
+            except Exception as error:
+                # i.e. no lazy proxy implementation installed or a
+                # feature the measured version does not support.
+                print('skipped %s: %r' % (key, error), file=sys.stderr)
+                skipped[key] = repr(error)
+                continue
+            results[key] = measure(func, number, repeat)
+    return OrderedDict((
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('di', di.__version__),
+        ('results', results),
+        ('memory', memory),
+        ('skipped', skipped),
+    ))
+
+
+def compare(current, baseline, threshold):
+    """
+    Compares the minimal timings and the retained memory of `current` and
+    `baseline`.
+
+    :returns: the list of regressed benchmark names and the rows to print.
+    """
+    regressions = []
+    rows = []
+    for section, metric, unit in (
+            ('results', 'min_us', 'us'), ('memory', 'bytes_per_config', 'B')):
+        for key, result in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(key)
+            if base is None:
+                rows.append((key, None, result[metric], None, unit))
+                continue
+            ratio = result[metric] / base[metric]
+            if ratio > 1 + threshold:
+                regressions.append(key)
+            rows.append((key, base[metric], result[metric], ratio, unit))
+    return regressions, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--benchmark', action='append',
+        choices=list(BENCHMARKS) + list(MEMORY_BENCHMARKS),
+        help='benchmark to run. can be given multiple times. default: all.')
+    parser.add_argument(
+        '--sizes', default='10,100,1000',
+        help='comma separated number of registered configurations.')
+    parser.add_argument('--number', type=int, default=1000,
+                        help='calls per measurement.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of measurements.')
+    parser.add_argument('--output', help='write the results as json.')
+    parser.add_argument('--compare', help='json results to compare with.')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='allowed slowdown against the baseline. default: 0.1 (10%%).')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    current = run(
+        args.benchmark or list(BENCHMARKS) + list(MEMORY_BENCHMARKS),
+        sizes, args.number, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2)
+
+    if not args.compare:
+        if not args.output:
+            print(json.dumps(current, indent=2))
+        return 0
+
+    with open(args.compare) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions, rows = compare(current, baseline, args.threshold)
+    for key, base, value, ratio, unit in rows:
+        if ratio is None:
+            print('%-40s %12s %10.2f%-2s %8s' % (key, 'new', value, unit, ''))
+        else:
+            print('%-40s %10.2f%-2s %10.2f%-2s %7.2fx%s' % (
+                key, base, unit, value, unit, ratio,
+                ' REGRESSION' if key in regressions else ''))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,19 +2,27 @@
 
 from __future__ import unicode_literals, absolute_import, print_function
 
+import gc
+import os
+import re
 import sys
+import math
+import keyword
 import inspect
+import operator
 import logging
 import warnings
 import functools
+import weakref
+import threading
 import contextlib
 
 from abc import ABCMeta, abstractmethod
-from collections import namedtuple, OrderedDict
+from collections import namedtuple, OrderedDict, deque
 from copy import copy
 
 __major__ = 1
-__minor__ = 8
+__minor__ = 9
 __bugfix__ = 0
 
 __version__ = '%s.%s.%s' % (__major__, __minor__, __bugfix__)
@@ -38,6 +46,9 @@ __all__ = (
     'mod_lazy', 'module_lazy', 'ModuleResolverLazy',
     'rel_lazy', 'relation_lazy', 'RelationResolverLazy',
     'factory_lazy', 'factory_lazy', 'FactoryResolverLazy',
+    'DIProfilingEventDispatcher', 'DIScope', 'ThreadScope', 'ContextScope',
+    'DIObjectPool', 'DICompiledResolvePlan', 'Proxy', 'unwrap',
+    'DISingletonStore', 'LRUSingletonStore', 'WeakSingletonStore',
 )
 
 py = sys.version_info
@@ -50,128 +61,1900 @@ if py3:
 else:
     string_types = (str, unicode)
 
+try:
+    from threading import get_ident
+except ImportError:  # 2.x
+    from thread import get_ident
+
+try:
+    import contextvars
+except ImportError:  # < 3.7
+    contextvars = None
+
+try:
+    from time import perf_counter as _timer
+except ImportError:  # 2.x
+    from time import time as _timer
+
 
 class DIEventDispatcher(object):
 
-    def __init__(self, container, *args, **kwargs):
-        self.container = container
+    #: names of all hook methods.
+    hooks = (
+        'initialized', 'before_register', 'after_register', 'after_resolve',
+        'before_resolve', 'before_build_up', 'after_build_up',
+        'before_resolve_type', 'after_resolve_type', 'after_clear',
+        'after_resolve_singleton', 'after_resolve_error',
+    )
+
+    def __init__(self, container, *args, **kwargs):
+        self.container = container
+
+    def get_hook(self, name):
+        """
+        Returns the bound hook method `name` or `None` if it is not
+        overridden, so the container can skip calling it.
+
+        :param name: the name of the hook.
+        :type name: str
+
+        :rtype: callable|None
+        """
+        method = getattr(type(self), name, None)
+        default = getattr(DIEventDispatcher, name)
+        if getattr(method, '__func__', method) is \
+                getattr(default, '__func__', default) and \
+                name not in vars(self):
+            return None
+        return getattr(self, name)
+
+    def initialized(self, *args, **kwargs):
+        pass
+
+    def before_register(self, name, settings, *args, **kwargs):
+        pass
+
+    def after_register(self, name, settings, *args, **kwargs):
+        pass
+
+    def after_resolve(self, name, instance, *args, **kwargs):
+        pass
+
+    def before_resolve(self, name, *args, **kwargs):
+        pass
+
+    def before_build_up(self, name, instance, overrides, *args, **kwargs):
+        pass
+
+    def after_build_up(self, name, instance, overrides, *args, **kwargs):
+        pass
+
+    def before_resolve_type(self, name, *args, **kwargs):
+        pass
+
+    def after_resolve_type(self, name, type, *args, **kwargs):
+        pass
+
+    def after_clear(self, name):
+        pass
+
+    def after_resolve_singleton(self, name, instance, *args, **kwargs):
+        pass
+
+    def after_resolve_error(self, name, error, *args, **kwargs):
+        pass
+
+
+class DICompositeEventDispatcher(DIEventDispatcher):
+    """
+    Event dispatcher that passes each event to all of the given
+    dispatchers in order.
+    """
+
+    def __init__(self, container, dispatchers=(), *args, **kwargs):
+        super(DICompositeEventDispatcher, self).__init__(container)
+        self.dispatchers = tuple(dispatchers)
+
+    def get_hook(self, name):
+        hooks = [
+            hook for hook in (
+                _get_event_hook(dispatcher, name)
+                for dispatcher in self.dispatchers)
+            if hook is not None]
+        if not hooks:
+            return None
+        if len(hooks) == 1:
+            return hooks[0]
+
+        def _hook(*args, **kwargs):
+            for hook in hooks:
+                hook(*args, **kwargs)
+        return _hook
+
+    def _dispatch(self, name, *args, **kwargs):
+        for dispatcher in self.dispatchers:
+            getattr(dispatcher, name)(*args, **kwargs)
+
+    def initialized(self, *args, **kwargs):
+        self._dispatch('initialized', *args, **kwargs)
+
+    def before_register(self, name, settings, *args, **kwargs):
+        self._dispatch('before_register', name, settings, *args, **kwargs)
+
+    def after_register(self, name, settings, *args, **kwargs):
+        self._dispatch('after_register', name, settings, *args, **kwargs)
+
+    def after_resolve(self, name, instance, *args, **kwargs):
+        self._dispatch('after_resolve', name, instance, *args, **kwargs)
+
+    def before_resolve(self, name, *args, **kwargs):
+        self._dispatch('before_resolve', name, *args, **kwargs)
+
+    def before_build_up(self, name, instance, overrides, *args, **kwargs):
+        self._dispatch(
+            'before_build_up', name, instance, overrides, *args, **kwargs)
+
+    def after_build_up(self, name, instance, overrides, *args, **kwargs):
+        self._dispatch(
+            'after_build_up', name, instance, overrides, *args, **kwargs)
+
+    def before_resolve_type(self, name, *args, **kwargs):
+        self._dispatch('before_resolve_type', name, *args, **kwargs)
+
+    def after_resolve_type(self, name, type, *args, **kwargs):
+        self._dispatch('after_resolve_type', name, type, *args, **kwargs)
+
+    def after_clear(self, name):
+        self._dispatch('after_clear', name)
+
+    def after_resolve_singleton(self, name, instance, *args, **kwargs):
+        self._dispatch(
+            'after_resolve_singleton', name, instance, *args, **kwargs)
+
+    def after_resolve_error(self, name, error, *args, **kwargs):
+        self._dispatch('after_resolve_error', name, error, *args, **kwargs)
+
+
+class DIProfilingEventDispatcher(DIEventDispatcher):
+    """
+    Event dispatcher that measures the resolving of each configuration.
+
+    For each name it counts the created instances, singleton hits and
+    errors and records the time spent including the related
+    configurations (`total`) and without them (`self`) in histograms with
+    power of two microsecond buckets. Nested resolves are tracked per
+    thread, so the times of concurrent `resolve_async` tasks are only
+    approximated.
+
+    Usage::
+
+        container = DIContainer(
+            settings, event_dispatcher=DIProfilingEventDispatcher)
+        ...
+        stats = container.event_dispatcher.snapshot()
+    """
+
+    def __init__(self, container, *args, **kwargs):
+        super(DIProfilingEventDispatcher, self).__init__(container)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+    def _get_stats(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _ResolveStats()
+        return stats
+
+    def _pop(self, name, instance=None, error=None, hit=False):
+        stack = self._stack()
+        if not stack:
+            return
+        key, start, children, depth = stack.pop()
+        total = _timer() - start
+        if stack:
+            stack[-1][2] += total
+        with self._lock:
+            stats = self._get_stats(
+                name if isinstance(name, string_types) else key)
+            stats.add(total, total - children, depth, hit, error is not None)
+
+    def before_resolve(self, name, *args, **kwargs):
+        # resolving by type resolves a name afterwards.
+        if isinstance(name, string_types):
+            stack = self._stack()
+            stack.append([name, _timer(), 0.0, len(stack)])
+
+    def after_resolve(self, name, instance, *args, **kwargs):
+        self._pop(name, instance=instance)
+
+    def after_resolve_singleton(self, name, instance, *args, **kwargs):
+        self._pop(name, instance=instance, hit=True)
+
+    def after_resolve_error(self, name, error, *args, **kwargs):
+        if isinstance(name, string_types):
+            self._pop(name, error=error)
+
+    def reset(self):
+        """
+        Drops all recorded values.
+        """
+        with self._lock:
+            self._stats = {}
+
+    def snapshot(self, reset=False):
+        """
+        Returns the recorded values by configuration name::
+
+            {'db': {
+                'count': 1,  # created instances
+                'singleton_hits': 10,
+                'hit_ratio': 0.909,  # hits of all resolves
+                'errors': 0,
+                'max_depth': 2,  # 0 for resolves not nested in another
+                'total': {'sum': 0.01, 'max': 0.01, 'buckets': {...}},
+                'self': {'sum': 0.002, 'max': 0.002, 'buckets': {...}},
+            }}
+
+        Times are in seconds. The buckets map the upper bound of each
+        bucket in microseconds to the number of resolves within it.
+
+        :param reset: drop the recorded values afterwards.
+        :type reset: bool
+
+        :rtype: dict
+        """
+        with self._lock:
+            stats = self._stats
+            if reset:
+                self._stats = {}
+            return dict(
+                (name, value.as_dict()) for name, value in stats.items())
+
+
+class _ResolveStats(object):
+    """
+    The values recorded by :class:`DIProfilingEventDispatcher` for one
+    configuration name.
+    """
+
+    __slots__ = (
+        'count', 'singleton_hits', 'errors', 'max_depth', 'total', 'self')
+
+    def __init__(self):
+        self.count = 0
+        self.singleton_hits = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.total = _Histogram()
+        self.self = _Histogram()
+
+    def add(self, total, self_time, depth, hit, error):
+        if hit:
+            self.singleton_hits += 1
+        elif error:
+            self.errors += 1
+        else:
+            self.count += 1
+            self.total.add(total)
+            self.self.add(self_time)
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def as_dict(self):
+        resolves = self.count + self.singleton_hits
+        return {
+            'count': self.count,
+            'singleton_hits': self.singleton_hits,
+            'hit_ratio': float(self.singleton_hits) / resolves
+            if resolves else 0.0,
+            'errors': self.errors,
+            'max_depth': self.max_depth,
+            'total': self.total.as_dict(),
+            'self': self.self.as_dict(),
+        }
+
+
+class _Histogram(object):
+    """
+    Histogram of durations with power of two microsecond buckets.
+    """
+
+    __slots__ = ('sum', 'max', 'buckets')
+
+    def __init__(self):
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = []
+
+    def add(self, seconds):
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = int(seconds * 1e6).bit_length()
+        if index >= len(self.buckets):
+            self.buckets.extend([0] * (index + 1 - len(self.buckets)))
+        self.buckets[index] += 1
+
+    def as_dict(self):
+        return {
+            'sum': self.sum,
+            'max': self.max,
+            'buckets': dict(
+                (2 ** index, count)
+                for index, count in enumerate(self.buckets) if count),
+        }
+
+
+#: the container attributes of the bound event hooks.
+_HOOK_ATTRIBUTES = tuple('_on_%s' % hook for hook in DIEventDispatcher.hooks)
+
+
+def _get_event_hook(dispatcher, name):
+    """
+    Returns the hook `name` of the given dispatcher or `None` if the
+    dispatcher does not override it. Objects not derived from
+    :class:`DIEventDispatcher` are asked for every hook.
+    """
+    if isinstance(dispatcher, DIEventDispatcher):
+        return dispatcher.get_hook(name)
+    return getattr(dispatcher, name, None)
+
+
+def _create_event_dispatcher(dispatcher, container):
+    """
+    Returns a new dispatcher of the type of `dispatcher` for `container`,
+    used by child containers. Objects not derived from
+    :class:`DIEventDispatcher` can not be created again and are shared.
+    """
+    if isinstance(dispatcher, DICompositeEventDispatcher):
+        return type(dispatcher)(container=container, dispatchers=[
+            _create_event_dispatcher(child, container)
+            for child in dispatcher.dispatchers])
+    if isinstance(dispatcher, DIEventDispatcher):
+        return type(dispatcher)(container=container)
+    return dispatcher
+
+
+_MISSING = object()
+
+
+class Proxy(object):
+    """
+    A lazy object proxy. The factory method is called on the first use
+    of the proxy - at most once, even if multiple threads use it at the
+    same time - and all operations are forwarded to its result. Use
+    :func:`unwrap` or `__wrapped__` to get the result itself.
+
+    It is the default `proxy_type_name` of the :class:`DIContainer`.
+    """
+
+    __slots__ = ('_proxy_factory', '_proxy_target', '_proxy_lock',
+                 '__weakref__')
+
+    def __init__(self, factory_method):
+        object.__setattr__(self, '_proxy_factory', factory_method)
+        object.__setattr__(self, '_proxy_target', _MISSING)
+        object.__setattr__(self, '_proxy_lock', threading.RLock())
+
+    @property
+    def __wrapped__(self):
+        """
+        The result of the factory method. Calls it on first access.
+        """
+        target = self._proxy_target
+        if target is _MISSING:
+            with self._proxy_lock:
+                target = self._proxy_target
+                if target is _MISSING:
+                    target = self._proxy_factory()
+                    object.__setattr__(self, '_proxy_target', target)
+                    # release everything the factory refers to.
+                    object.__setattr__(self, '_proxy_factory', None)
+        return target
+
+    @property
+    def __resolved__(self):
+        """
+        Whether the factory method was already called.
+        """
+        return self._proxy_target is not _MISSING
+
+    @property
+    def __class__(self):
+        return type(self.__wrapped__)
+
+    def __getattr__(self, name):
+        return getattr(self.__wrapped__, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.__wrapped__, name, value)
+
+    def __delattr__(self, name):
+        delattr(self.__wrapped__, name)
+
+    def __dir__(self):
+        return dir(self.__wrapped__)
+
+    def __repr__(self):
+        return repr(self.__wrapped__)
+
+    def __str__(self):
+        return str(self.__wrapped__)
+
+    def __hash__(self):
+        return hash(self.__wrapped__)
+
+    def __bool__(self):
+        return bool(self.__wrapped__)
+
+    __nonzero__ = __bool__
+
+    def __call__(self, *args, **kwargs):
+        return self.__wrapped__(*args, **kwargs)
+
+    def __len__(self):
+        return len(self.__wrapped__)
+
+    def __iter__(self):
+        return iter(self.__wrapped__)
+
+    def __reversed__(self):
+        return reversed(self.__wrapped__)
+
+    def __contains__(self, value):
+        return value in self.__wrapped__
+
+    def __getitem__(self, key):
+        return self.__wrapped__[key]
+
+    def __setitem__(self, key, value):
+        self.__wrapped__[key] = value
+
+    def __delitem__(self, key):
+        del self.__wrapped__[key]
+
+    def __enter__(self):
+        return self.__wrapped__.__enter__()
+
+    def __exit__(self, *args):
+        return self.__wrapped__.__exit__(*args)
+
+    def __int__(self):
+        return int(self.__wrapped__)
+
+    def __float__(self):
+        return float(self.__wrapped__)
+
+    def __complex__(self):
+        return complex(self.__wrapped__)
+
+    def __bytes__(self):
+        return bytes(self.__wrapped__)
+
+    def __round__(self, *args):
+        return round(self.__wrapped__, *args)
+
+    def __trunc__(self):
+        return math.trunc(self.__wrapped__)
+
+    def __floor__(self):
+        return math.floor(self.__wrapped__)
+
+    def __ceil__(self):
+        return math.ceil(self.__wrapped__)
+
+    def __fspath__(self):
+        return os.fspath(self.__wrapped__)
+
+    def __await__(self):
+        return self.__wrapped__.__await__()
+
+    def __aiter__(self):
+        return self.__wrapped__.__aiter__()
+
+    def __anext__(self):
+        return self.__wrapped__.__anext__()
+
+    def __aenter__(self):
+        return self.__wrapped__.__aenter__()
+
+    def __aexit__(self, *args):
+        return self.__wrapped__.__aexit__(*args)
+
+    def __index__(self):
+        return operator.index(self.__wrapped__)
+
+    def __format__(self, format_spec):
+        return format(self.__wrapped__, format_spec)
+
+    def __reduce_ex__(self, protocol):
+        # pickle the target instead of the proxy.
+        return self.__wrapped__.__reduce_ex__(protocol)
+
+
+def _proxy_operator(func, reflected=False):
+    if reflected:
+        return lambda self, other: func(other, self.__wrapped__)
+    return lambda self, other: func(self.__wrapped__, other)
+
+
+def _proxy_inplace_operator(func):
+    def inplace(self, other):
+        # like `target += other`: the proxy keeps the result, which is
+        # the target itself for mutable types.
+        result = func(self.__wrapped__, other)
+        object.__setattr__(self, '_proxy_target', result)
+        return self
+    return inplace
+
+
+for _name, _func in (
+        ('eq', operator.eq), ('ne', operator.ne), ('lt', operator.lt),
+        ('le', operator.le), ('gt', operator.gt), ('ge', operator.ge)):
+    setattr(Proxy, '__%s__' % _name, _proxy_operator(_func))
+
+_binary_operators = [
+    ('add', operator.add), ('sub', operator.sub), ('mul', operator.mul),
+    ('truediv', operator.truediv), ('floordiv', operator.floordiv),
+    ('mod', operator.mod), ('pow', operator.pow),
+    ('lshift', operator.lshift), ('rshift', operator.rshift),
+    ('and', operator.and_), ('or', operator.or_), ('xor', operator.xor)]
+if hasattr(operator, 'matmul'):  # 3.5+
+    _binary_operators.append(('matmul', operator.matmul))
+if py2:
+    _binary_operators.append(('div', operator.div))  # noqa
+
+for _name, _func in _binary_operators:
+    setattr(Proxy, '__%s__' % _name, _proxy_operator(_func))
+    setattr(Proxy, '__r%s__' % _name, _proxy_operator(_func, True))
+    setattr(Proxy, '__i%s__' % _name, _proxy_inplace_operator(
+        getattr(operator, 'i%s' % _name.rstrip('_'))))
+
+Proxy.__divmod__ = _proxy_operator(divmod)
+Proxy.__rdivmod__ = _proxy_operator(divmod, True)
+
+for _name, _func in (
+        ('neg', operator.neg), ('pos', operator.pos), ('abs', operator.abs),
+        ('invert', operator.invert)):
+    setattr(Proxy, '__%s__' % _name, (
+        lambda func: lambda self: func(self.__wrapped__))(_func))
+
+del _name, _func, _binary_operators
+
+if py2:
+    Proxy.__unicode__ = lambda self: unicode(self.__wrapped__)  # noqa
+    Proxy.__long__ = lambda self: long(self.__wrapped__)  # noqa
+
+
+def unwrap(value):
+    """
+    Returns the object behind a lazy :class:`Proxy` - resolving it if
+    necessary - or the given value if it is no proxy.
+    """
+    # type() instead of isinstance, which would resolve the proxy.
+    if issubclass(type(value), Proxy):
+        return value.__wrapped__
+    return value
+
+
+class _FrozenDict(dict):
+    """
+    An immutable dictionary. Used as the shared empty default of the
+    dictionary options of all configurations.
+    """
+
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('The default configuration values are immutable.')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _immutable
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        if not self:
+            # unpickle as the shared default. python 2 requires a byte
+            # string here.
+            return str('_EMPTY_DICT')
+        return type(self), (dict(self),)
+
+
+_EMPTY_DICT = _FrozenDict()
+
+default_config = {
+    'name': None,
+    'type': None,
+    'args': (),
+    'kwargs': _EMPTY_DICT,
+    'singleton': False,
+    'lazy': True,
+    'properties': _EMPTY_DICT,
+    'assert_type': None,
+    'factory_method': None,
+    'alias': (),
+    'mixins': (),
+    'scope': None,
+    'dispose_method': None,
+    'pool': None,
+    'evictable': False,
+    'fork_safe': False,
+}
+
+try:
+    _intern = sys.intern
+except AttributeError:  # 2.x
+    def _intern(value):
+        # only byte strings can be interned.
+        return intern(value) if isinstance(value, str) else value  # noqa
+
+#: the options holding python names, interned to share equal strings.
+_INTERNED_OPTIONS = frozenset((
+    'type', 'assert_type', 'factory_method', 'scope', 'dispose_method'))
+
+
+class MissingConfigurationError(KeyError, AttributeError):
+    """
+    Exception that will be raised if the requested key is not configured.
+    """
+
+    def __init__(self, key):
+        super(MissingConfigurationError, self).__init__(
+            'No configuration named "%s". Please specify in '
+            'settings or register at runtime.' % key)
+
+
+class DIConfigurationError(Exception):
+    """
+    Error that will be raised if there is an invalid configuration given
+    for the di container.
+    """
+
+
+class CircularDependencyError(DIConfigurationError):
+    """
+    Error that will be raised if the creation of a singleton depends on
+    itself, or if two threads wait for each others singletons.
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        super(CircularDependencyError, self).__init__(
+            'Circular dependency while creating singletons: %s.'
+            % ' -> '.join(str(name) for name in self.names))
+
+
+class PoolExhaustedError(DIConfigurationError):
+    """
+    Error that will be raised if no pooled instance became available
+    within the timeout.
+    """
+
+    def __init__(self, name, max_size):
+        self.name = name
+        super(PoolExhaustedError, self).__init__(
+            'All %s instances of the pool "%s" are checked out.' % (
+                max_size, name))
+
+
+class ValidationError(DIConfigurationError):
+    """
+    Error that will be raised if the dependency graph of a container
+    contains cycles, relations to missing configurations or - if roots
+    are given - unreachable configurations.
+
+    :ivar cycles: list of lists of configuration names.
+    :ivar dangling: list of :class:`DIDependency` to missing names.
+    :ivar unreachable: list of configuration names.
+    """
+
+    def __init__(self, cycles=(), dangling=(), unreachable=()):
+        self.cycles = list(cycles)
+        self.dangling = list(dangling)
+        self.unreachable = list(unreachable)
+        problems = []
+        for cycle in self.cycles:
+            problems.append('cycle %s' % ' -> '.join(
+                str(name) for name in list(cycle) + [cycle[0]]))
+        for dependency in self.dangling:
+            problems.append('missing "%s" for %s of "%s"' % (
+                dependency.target, dependency.attribute, dependency.source))
+        for name in self.unreachable:
+            problems.append('unreachable "%s"' % name)
+        super(ValidationError, self).__init__(
+            'Invalid configuration: %s.' % '; '.join(problems))
+
+
+class InitializationError(DIConfigurationError):
+    """
+    Error that will be raised if one or more non-lazy configurations
+    could not be created while bootstrapping the container.
+
+    :ivar errors: the exceptions by configuration name.
+    :ivar skipped: names that were not created because a dependency failed.
+    """
+
+    def __init__(self, errors, skipped=()):
+        self.errors = errors
+        self.skipped = tuple(skipped)
+        super(InitializationError, self).__init__(
+            'Could not create the non-lazy configurations: %s.' % ', '.join(
+                '%s (%r)' % (name, error) for name, error in errors.items()))
+
+
+class _ContextLocal(object):
+    """
+    A value that is local to the current thread and asyncio task. Uses a
+    context variable, or a thread local before python 3.7. The variable
+    is created on the first :meth:`set`, so unused instances are cheap.
+    """
+
+    _create_lock = threading.Lock()
+
+    def __init__(self, name, default=None):
+        self._name = name
+        self._default = default
+        self._var = None
+
+    def _get_var(self):
+        if self._var is None:
+            with self._create_lock:
+                if self._var is None:
+                    if contextvars is not None:
+                        self._var = contextvars.ContextVar(
+                            '%s_%s' % (self._name, id(self)),
+                            default=self._default)
+                    else:
+                        self._var = threading.local()
+        return self._var
+
+    def get(self):
+        var = self._var
+        if var is None:
+            return self._default
+        if contextvars is not None:
+            return var.get()
+        return getattr(var, 'value', self._default)
+
+    def set(self, value):
+        """
+        Sets the value.
+
+        :returns: a token for :meth:`reset`.
+        """
+        var = self._get_var()
+        if contextvars is not None:
+            return var.set(value)
+        token = self.get()
+        var.value = value
+        return token
+
+    def reset(self, token):
+        """
+        Restores the value before :meth:`set` returned `token`.
+        """
+        var = self._get_var()
+        if contextvars is not None:
+            var.reset(token)
+        else:
+            var.value = token
+
+
+class WarmupError(DIConfigurationError):
+    """
+    Error that will be raised if :meth:`DIContainer.warmup` could not
+    import one or more types or modules.
+
+    :ivar errors: the exceptions by the failed python name.
+    :ivar names: the configuration names using each failed python name.
+    """
+
+    def __init__(self, errors, names):
+        self.errors = errors
+        self.names = names
+        super(WarmupError, self).__init__(
+            'Could not import: %s.' % ', '.join(
+                '%s used by %s (%r)' % (
+                    target, ', '.join(names.get(target, ())), error)
+                for target, error in errors.items()))
+
+
+class DIConfig(namedtuple('DIConfigBase', default_config.keys())):
+    """
+    This type is used for the internal configuration. Each configuration dict
+    becomes passed into an instance of this class.
+
+    Instances have no `__dict__`. Empty options share immutable defaults
+    and python names are interned, so large registries stay small.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, **kwargs):
+        type_ = kwargs.get('type')
+        if not type_:
+            raise ValueError("'type' argument is required.")
+        if kwargs.get('singleton') and kwargs.get('scope'):
+            raise ValueError(
+                "'singleton' and 'scope' can not be used together.")
+        if kwargs.get('pool') and (
+                kwargs.get('singleton') or kwargs.get('scope')):
+            raise ValueError(
+                "'pool' can not be used with 'singleton' or 'scope'.")
+        if kwargs.get('evictable') and not kwargs.get('singleton'):
+            raise ValueError("'evictable' requires 'singleton'.")
+        if kwargs.get('fork_safe') and not kwargs.get('singleton'):
+            raise ValueError("'fork_safe' requires 'singleton'.")
+        values = list(_DEFAULT_VALUES)
+        for key, value in kwargs.items():
+            try:
+                index = _FIELD_INDEXES[key]
+            except KeyError:
+                raise TypeError(
+                    'Unknown configuration options: %s.' % ', '.join(
+                        sorted(set(kwargs).difference(cls._fields))))
+            if key in _INTERNED_OPTIONS:
+                if isinstance(value, string_types):
+                    value = _intern(value)
+            elif type(value) is dict and not value and \
+                    values[index] is _EMPTY_DICT:
+                # share the immutable default for empty dictionaries.
+                continue
+            values[index] = value
+        return tuple.__new__(cls, values)
+
+    def __reduce__(self):
+        return _load_config, (type(self), tuple(self))
+
+
+#: the default values and the index of each option of `DIConfig`.
+_DEFAULT_VALUES = tuple(default_config[field] for field in DIConfig._fields)
+_FIELD_INDEXES = dict((field, i) for i, field in enumerate(DIConfig._fields))
+
+
+def _load_config(cls, values):
+    """
+    Recreates a pickled configuration without validating it again.
+    """
+    return tuple.__new__(cls, values)
+
+
+class DIConfigManager(dict):
+    """
+    This type is used for the internal wrapping of the settings dictionary
+    to control reading and temporarily delivering deviant settings for a name.
+
+    The deviant settings of :meth:`DIContainer.context` are kept per
+    thread and asyncio task and can be nested. The innermost settings
+    that configure a name win.
+    """
+
+    def __init__(self, settings_dict):
+        super(DIConfigManager, self).__init__(settings_dict)
+        for key, config in list(self.items()):
+            if not isinstance(config, DIConfig):
+                # create an instance of DIConfig for each config element.
+                # that makes it easier to work with it later.
+                super(DIConfigManager, self).__setitem__(
+                    key, DIConfig(name=key, **config))
+                _logger.debug(
+                    'Created DIConfig for configuration key %s.', key)
+
+        # maps each alias name to the name of its configuration.
+        self.aliases = {}
+        for key, conf in self.items():
+            if conf.alias:
+                self._check_aliases(key, conf)
+                self._add_aliases(key, conf)
+
+        # the applied context settings, innermost last.
+        self._contexts = _ContextLocal('di_context', ())
+
+    def _check_aliases(self, key, conf):
+        """
+        Checks that the alias names of `conf` are not used by another
+        configuration than `key`.
+
+        :raises: DIConfigurationError
+        """
+        for alias in getattr(conf, 'alias', None) or ():
+            other = self.aliases.get(alias, key)
+            if other != key:
+                raise DIConfigurationError(
+                    'alias "%s" of configuration "%s" is already used by '
+                    'configuration "%s".' % (alias, key, other))
+        self._check_names(key, conf, self.aliases)
+
+    def _check_names(self, key, conf, aliases, confs=()):
+        """
+        Checks that `key` is not an alias of another configuration and
+        that the alias names of `conf` are not the name of another
+        configuration in this manager or in `confs`.
+
+        :raises: DIConfigurationError
+        """
+        other = aliases.get(key, key)
+        if other != key:
+            raise DIConfigurationError(
+                'configuration "%s" is already used as alias by '
+                'configuration "%s".' % (key, other))
+        for alias in getattr(conf, 'alias', None) or ():
+            if alias != key and (alias in confs or alias in self):
+                raise DIConfigurationError(
+                    'alias "%s" of configuration "%s" is already the name '
+                    'of a configuration.' % (alias, key))
+
+    def _add_aliases(self, key, conf):
+        """
+        Adds the alias names of `conf` to the alias index.
+        """
+        for alias in getattr(conf, 'alias', None) or ():
+            self.aliases[alias] = key
+
+    def _remove_aliases(self, key):
+        """
+        Removes the alias names of the configuration `key` from the
+        alias index.
+        """
+        conf = super(DIConfigManager, self).get(key)
+        for alias in getattr(conf, 'alias', None) or ():
+            if self.aliases.get(alias) == key:
+                del self.aliases[alias]
+
+    def update_configs(self, confs):
+        """
+        Sets multiple configurations at once. The alias names of all of
+        them are checked before anything is changed and the alias index
+        is updated once.
+
+        :param confs: the configurations by name.
+        :type confs: dict
+
+        :raises: DIConfigurationError
+        """
+        aliases = dict(self.aliases)
+        for key in confs:
+            conf = super(DIConfigManager, self).get(key)
+            for alias in getattr(conf, 'alias', None) or ():
+                if aliases.get(alias) == key:
+                    del aliases[alias]
+        for key, conf in confs.items():
+            for alias in getattr(conf, 'alias', None) or ():
+                other = aliases.setdefault(alias, key)
+                if other != key:
+                    raise DIConfigurationError(
+                        'alias "%s" of configuration "%s" is already used '
+                        'by configuration "%s".' % (alias, key, other))
+        for key, conf in confs.items():
+            self._check_names(key, conf, aliases, confs)
+        for key, conf in confs.items():
+            super(DIConfigManager, self).__setitem__(key, conf)
+        self.aliases = aliases
+
+    def resolve_alias(self, alias):
+        """
+        Returns the name of the configuration with the given alias.
+
+        :param alias: the alias name to lookup.
+        :type alias: str|unicode
+
+        :raises: KeyError if there is no configuration with this alias.
+        :rtype: str|unicode
+        """
+        for context_settings in reversed(self._contexts.get()):
+            if hasattr(context_settings, 'resolve_alias'):
+                try:
+                    return context_settings.resolve_alias(alias)
+                except KeyError:
+                    pass
+        return self.aliases[alias]
+
+    @property
+    def context_settings(self):
+        """
+        The innermost applied context settings or `None`.
+        """
+        contexts = self._contexts.get()
+        return contexts[-1] if contexts else None
+
+    @context_settings.setter
+    def context_settings(self, settings):
+        self._contexts.set((settings,) if settings is not None else ())
+
+    def apply_context(self, settings):
+        """
+        Applies the given settings on top of the current ones for the
+        current thread or asyncio task.
+
+        :returns: a token for :meth:`reset_context`.
+        """
+        return self._contexts.set(self._contexts.get() + (settings,))
+
+    def reset_context(self, token=None):
+        """
+        Removes the settings applied by :meth:`apply_context`. Without
+        `token` the innermost settings are removed.
+        """
+        if token is not None:
+            self._contexts.reset(token)
+        else:
+            self._contexts.set(self._contexts.get()[:-1])
+
+    def __getitem__(self, key):
+        for context_settings in reversed(self._contexts.get()):
+            if key in context_settings:
+                return context_settings[key]
+        return super(DIConfigManager, self).__getitem__(key)
+
+    def __setitem__(self, key, conf):
+        self._check_aliases(key, conf)
+        self._remove_aliases(key)
+        super(DIConfigManager, self).__setitem__(key, conf)
+        self._add_aliases(key, conf)
+
+    def __delitem__(self, key):
+        self._remove_aliases(key)
+        super(DIConfigManager, self).__delitem__(key)
+
+
+class DITypeCache(object):
+    """
+    A bounded cache for resolved types. The least recently used types
+    become dropped if `maxsize` is exceeded. A `maxsize` of `None` means
+    unbounded, a `maxsize` of `0` disables the cache.
+
+    Types set with `pinned=True`, the types computed with mixins, are
+    neither counted nor dropped, so their key always maps to the same
+    type. Only :meth:`clear` drops them.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._types = OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        type_ = self._pinned.get(key)
+        if type_ is not None:
+            return type_
+        with self._lock:
+            try:
+                type_ = self._types.pop(key)
+            except KeyError:
+                return default
+            # reinsert to mark the type as recently used.
+            self._types[key] = type_
+            return type_
+
+    def set(self, key, type_, pinned=False):
+        if pinned:
+            with self._lock:
+                # keep the type of a concurrent first lookup.
+                return self._pinned.setdefault(key, type_)
+        if self.maxsize == 0:
+            return type_
+        with self._lock:
+            self._types.pop(key, None)
+            self._types[key] = type_
+            if self.maxsize is not None:
+                while len(self._types) > self.maxsize:
+                    self._types.popitem(last=False)
+        return type_
+
+    def clear(self):
+        with self._lock:
+            self._types.clear()
+            self._pinned.clear()
+
+    def __contains__(self, key):
+        return key in self._pinned or key in self._types
+
+    def __len__(self):
+        return len(self._pinned) + len(self._types)
+
+
+class DIResolvePlan(object):
+    """
+    A precompiled plan to create instances of a single configuration.
+    It holds the resolved type, the factory callable and callables
+    for each argument and property, so resolving does not need to
+    interpret the configuration again.
+    """
+
+    __slots__ = ('conf', 'type', 'factory', 'args', 'kwargs', 'properties')
+
+    def __init__(self, conf, type_, factory, args, kwargs, properties):
+        self.conf = conf
+        self.type = type_
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+        self.properties = properties
+
+    def __call__(self):
+        """
+        Creates a new instance with the configured arguments.
+        """
+        kwargs = dict((key, value()) for key, value in self.kwargs)
+        args = [value() for value in self.args]
+        return self.factory(*args, **kwargs)
+
+    def build_up(self, instance):
+        """
+        Sets the configured properties on the given instance.
+        """
+        for key, value in self.properties:
+            setattr(instance, key, value())
+        return instance
+
+
+class DICompiledResolvePlan(DIResolvePlan):
+    """
+    A resolve plan that uses the generated functions of a module created
+    by :meth:`DIContainer.compile_settings`.
+    """
+
+    __slots__ = ('container', 'create', 'build')
+
+    def __init__(self, conf, type_, factory, container, create, build):
+        super(DICompiledResolvePlan, self).__init__(
+            conf, type_, factory, (), (), ())
+        self.container = container
+        self.create = create
+        self.build = build
+
+    def __call__(self):
+        return self.create(self.container)
+
+    def build_up(self, instance):
+        self.build(self.container, instance)
+        return instance
+
+
+#: A relation of the configuration `source` to the configuration `target`,
+#: given by the args, kwargs or properties entry `attribute`.
+DIDependency = namedtuple(
+    'DIDependency', ('source', 'target', 'lazy', 'attribute'))
+
+
+def _get_relation(value):
+    """
+    Returns the related name and whether the relation is lazy if the
+    given configuration value is a `RelationResolver` or a `rel:` string.
+    Otherwise `None`.
+
+    :rtype: tuple|None
+    """
+    if isinstance(value, RelationResolver):
+        return value.value_conf, isinstance(value, LazyResolverMixin)
+    if isinstance(value, string_types):
+        for resolver_class in (RelationResolver, RelationResolverLazy):
+            prefix = '%s:' % resolver_class.key
+            if value.startswith(prefix):
+                return value[len(prefix):], resolver_class is not \
+                    RelationResolver
+    return None
+
+
+def _get_relations(conf):
+    """
+    Returns the relations of the configuration `conf` as tuples of the
+    attribute, the related name and whether the relation is lazy.
+
+    :rtype: list
+    """
+    if not (conf.args or conf.kwargs or conf.properties):
+        return []
+    conf_args, conf_kwargs = DIContainer._split_args(conf.args, conf.kwargs)
+    values = [('args[%s]' % i, value) for i, value in enumerate(conf_args)]
+    values.extend(
+        ('kwargs.%s' % key, value) for key, value in conf_kwargs.items())
+    values.extend(
+        ('properties.%s' % key, value)
+        for key, value in conf.properties.items())
+    relations = []
+    for attribute, value in values:
+        relation = _get_relation(value)
+        if relation is not None:
+            relations.append((attribute, relation[0], relation[1]))
+    return relations
+
+
+class DIDependencyGraph(object):
+    """
+    The graph of the relations between configurations, given by
+    `RelationResolver` instances and `rel:` strings in the args, kwargs and
+    properties. Nothing becomes imported or instantiated to build it.
+
+    :param settings: the configurations by name.
+    :type settings: di.DIConfigManager|dict
+    :param external: names that are resolvable outside of the settings
+        (i.e. by a parent container).
+    :type external: iterable
+    """
+
+    def __init__(self, settings, external=()):
+        aliases = getattr(settings, 'aliases', {})
+        self.nodes = list(settings.keys())
+        self.edges = OrderedDict((name, []) for name in self.nodes)
+        self.external = set(external)
+
+        for name, conf in settings.items():
+            for attribute, target, lazy in _get_relations(conf):
+                if target not in self.edges:
+                    target = aliases.get(target, target)
+                self.edges[name].append(
+                    DIDependency(name, target, lazy, attribute))
+
+    def dependencies(self, name, lazy=False):
+        """
+        Returns the names of the configurations `name` relates to. Lazy
+        relations and missing names are left out.
+
+        :param lazy: include lazy relations.
+        :type lazy: bool
+
+        :rtype: list
+        """
+        names = []
+        for dependency in self.edges[name]:
+            if (lazy or not dependency.lazy) and \
+                    dependency.target in self.edges and \
+                    dependency.target not in names:
+                names.append(dependency.target)
+        return names
+
+    def dangling(self):
+        """
+        Returns the relations to names that are neither configured nor
+        an alias nor external.
+
+        :rtype: list
+        """
+        return [
+            dependency
+            for dependencies in self.edges.values()
+            for dependency in dependencies
+            if dependency.target not in self.edges and
+            dependency.target not in self.external]
+
+    def cycles(self):
+        """
+        Returns the cycles of non-lazy relations. Each cycle is a list of
+        configuration names.
+
+        :rtype: list
+        """
+        # tarjan's strongly connected components without recursion.
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+
+        for root in self.nodes:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.dependencies(root)))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.dependencies(child))))
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or \
+                                node in self.dependencies(node):
+                            component.reverse()
+                            cycles.append(component)
+        return cycles
+
+    def unreachable(self, roots):
+        """
+        Returns the names of all configurations that can not be reached
+        from the given root names by any relation.
+
+        :param roots: names of configurations used directly.
+        :type roots: iterable
+
+        :rtype: list
+        """
+        reached = set()
+        pending = [root for root in roots if root in self.edges]
+        while pending:
+            name = pending.pop()
+            if name in reached:
+                continue
+            reached.add(name)
+            pending.extend(self.dependencies(name, lazy=True))
+        return [name for name in self.nodes if name not in reached]
+
+    def topological_order(self):
+        """
+        Returns all configuration names ordered so each name comes after
+        the names it relates to non-lazily. Otherwise the order of
+        registration is kept.
+
+        :raises: CircularDependencyError
+        :rtype: list
+        """
+        remaining = {}
+        dependents = dict((name, []) for name in self.nodes)
+        for name in self.nodes:
+            dependencies = self.dependencies(name)
+            remaining[name] = len(dependencies)
+            for dependency in dependencies:
+                dependents[dependency].append(name)
+
+        order = []
+        ready = deque(name for name in self.nodes if not remaining[name])
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if not remaining[dependent]:
+                    ready.append(dependent)
+
+        if len(order) < len(self.nodes):
+            raise CircularDependencyError(self.cycles()[0])
+        return order
+
+    def as_dict(self):
+        """
+        Returns the graph as a json serializable dictionary.
+
+        :rtype: dict
+        """
+        try:
+            order = self.topological_order()
+        except CircularDependencyError:
+            order = None
+        return OrderedDict((
+            ('nodes', [str(name) for name in self.nodes]),
+            ('edges', [
+                OrderedDict((
+                    ('source', str(dependency.source)),
+                    ('target', str(dependency.target)),
+                    ('lazy', dependency.lazy),
+                    ('attribute', dependency.attribute),
+                ))
+                for dependencies in self.edges.values()
+                for dependency in dependencies]),
+            ('order', order),
+            ('cycles', self.cycles()),
+            ('dangling', [
+                OrderedDict((
+                    ('source', str(dependency.source)),
+                    ('target', str(dependency.target)),
+                ))
+                for dependency in self.dangling()]),
+        ))
+
+    def to_json(self, **kwargs):
+        """
+        Returns the graph as json string. See :meth:`as_dict`.
+
+        :param kwargs: passed to `json.dumps`.
+        :rtype: str
+        """
+        import json
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def to_dot(self, name='di'):
+        """
+        Returns the graph in the graphviz dot language. Lazy relations
+        are dashed, relations to missing names red.
+
+        :rtype: str
+        """
+        dangling = set(self.dangling())
+        lines = ['digraph "%s" {' % name]
+        for node in self.nodes:
+            lines.append('    "%s";' % node)
+        for dependencies in self.edges.values():
+            for dependency in dependencies:
+                attributes = ['label="%s"' % dependency.attribute]
+                if dependency.lazy:
+                    attributes.append('style=dashed')
+                if dependency in dangling:
+                    attributes.append('color=red')
+                lines.append('    "%s" -> "%s" [%s];' % (
+                    dependency.source, dependency.target,
+                    ', '.join(attributes)))
+        lines.append('}')
+        return '\n'.join(lines)
+
+
+class DIScope(object):
+    """
+    Base type of the scopes used by the `scope` configuration option.
+    A scope holds a store of the instances created in it, that is
+    replaced when :meth:`DIContainer.scope` is entered and restored (and
+    its instances disposed) when it is left.
+
+    Register own scopes with :meth:`DIContainer.add_scope`.
+    """
+
+    #: the name used in the `scope` option.
+    key = None
+
+    def __init__(self, container):
+        self.container = container
+
+    def get_store(self):
+        """
+        Returns the store of the current scope or `None` if there is no
+        active scope.
+
+        :rtype: collections.OrderedDict|None
+        """
+        raise NotImplementedError()
+
+    def enter(self):
+        """
+        Activates a new, empty store.
+
+        :returns: a token for :meth:`exit`.
+        """
+        raise NotImplementedError()
+
+    def exit(self, token):
+        """
+        Restores the store active before :meth:`enter` returned `token`.
+
+        :returns: the store that was active.
+        :rtype: collections.OrderedDict
+        """
+        raise NotImplementedError()
+
+
+class ThreadScope(DIScope):
+    """
+    Scope with a store per thread. Each thread has an implicit store
+    that lives as long as the thread, so a scope does not need to be
+    entered.
+    """
+
+    key = 'thread'
+
+    def __init__(self, container):
+        super(ThreadScope, self).__init__(container)
+        self._local = threading.local()
+
+    def get_store(self):
+        try:
+            return self._local.store
+        except AttributeError:
+            store = self._local.store = OrderedDict()
+            return store
+
+    def enter(self):
+        token = getattr(self._local, 'store', None)
+        self._local.store = OrderedDict()
+        return token
+
+    def exit(self, token):
+        store = self._local.store
+        if token is None:
+            del self._local.store
+        else:
+            self._local.store = token
+        return store
+
+
+class ContextScope(DIScope):
+    """
+    Scope with a store per :meth:`DIContainer.scope` block, i.e. per
+    request. It is kept in a context variable, so asyncio tasks created
+    in the block share it. Without `contextvars` (< 3.7) it is kept per
+    thread.
+    """
+
+    key = 'context'
+
+    def __init__(self, container):
+        super(ContextScope, self).__init__(container)
+        self._store = _ContextLocal('di_scope')
+
+    def get_store(self):
+        return self._store.get()
 
-    def initialized(self, *args, **kwargs):
-        pass
+    def enter(self):
+        return self._store.set(OrderedDict())
 
-    def before_register(self, name, settings, *args, **kwargs):
-        pass
+    def exit(self, token):
+        store = self._store.get()
+        self._store.reset(token)
+        return store
 
-    def after_register(self, name, settings, *args, **kwargs):
-        pass
 
-    def after_resolve(self, name, instance, *args, **kwargs):
-        pass
+class DIObjectPool(object):
+    """
+    A pool of reusable instances of one configuration, used for the
+    `pool` option::
+
+        'parser': {
+            'type': 'myapp.Parser',
+            'pool': {
+                'min_size': 2,  # instances kept when evicting idle ones
+                'max_size': 8,  # instances checked out at the same time
+                'idle_timeout': 60,  # seconds until an idle one is dropped
+                'reset': {'buffer': None},  # properties set on release
+            },
+        }
+
+    `'pool': True` uses the defaults: no minimum, at most 8 instances and
+    no idle timeout. New instances are created with
+    :meth:`DIContainer.resolve`.
+    """
 
-    def before_resolve(self, name, *args, **kwargs):
-        pass
+    def __init__(self, container, name, conf):
+        options = conf.pool if isinstance(conf.pool, dict) else {}
+        self.container = container
+        self.name = name
+        self.conf = conf
+        self.min_size = options.get('min_size', 0)
+        self.max_size = options.get('max_size', 8)
+        self.idle_timeout = options.get('idle_timeout')
+        self.reset = tuple(
+            (key, container._compile_value(value))
+            for key, value in options.get('reset', {}).items())
+        # number of created instances, idle or checked out.
+        self.size = 0
+        # idle instances with the time they were released. the most
+        # recently released one is reused first.
+        self._idle = deque()
+        self._condition = threading.Condition(threading.Lock())
+
+    def _evict(self, now):
+        """
+        Removes the instances idle for longer than `idle_timeout`, but
+        keeps at least `min_size` instances. Must hold the lock.
 
-    def before_build_up(self, name, instance, overrides, *args, **kwargs):
-        pass
+        :returns: the evicted instances.
+        """
+        evicted = []
+        if self.idle_timeout is None:
+            return evicted
+        while self._idle and self.size > self.min_size and \
+                now - self._idle[0][1] > self.idle_timeout:
+            evicted.append(self._idle.popleft()[0])
+            self.size -= 1
+        return evicted
+
+    def _dispose(self, instances):
+        method = self.conf.dispose_method
+        if not method:
+            return
+        for instance in instances:
+            try:
+                getattr(instance, method)()
+            except Exception:
+                _logger.exception('Could not dispose "%s".', self.name)
 
-    def after_build_up(self, name, instance, overrides, *args, **kwargs):
-        pass
+    def acquire(self, timeout=None):
+        """
+        Returns an idle instance or creates a new one. Waits up to
+        `timeout` seconds (forever if `None`) if `max_size` instances are
+        checked out.
 
-    def before_resolve_type(self, name, *args, **kwargs):
-        pass
+        :raises: PoolExhaustedError
+        """
+        deadline = None if timeout is None else _timer() + timeout
+        with self._condition:
+            while True:
+                evicted = self._evict(_timer())
+                if self._idle:
+                    instance = self._idle.pop()[0]
+                    break
+                if self.max_size is None or self.size < self.max_size:
+                    self.size += 1
+                    instance = None
+                    break
+                remaining = None if deadline is None else deadline - _timer()
+                if remaining is not None and remaining <= 0:
+                    self._dispose(evicted)
+                    raise PoolExhaustedError(self.name, self.max_size)
+                self._condition.wait(remaining)
+        self._dispose(evicted)
+
+        if instance is None:
+            try:
+                instance = self.container.resolve(self.name)
+            except Exception:
+                with self._condition:
+                    self.size -= 1
+                    self._condition.notify()
+                raise
+        return instance
 
-    def after_resolve_type(self, name, type, *args, **kwargs):
-        pass
+    def release(self, instance):
+        """
+        Sets the `reset` properties on the instance and returns it into
+        the pool.
+        """
+        try:
+            for key, value in self.reset:
+                setattr(instance, key, value())
+        except Exception:
+            # do not reuse an instance in an unknown state.
+            with self._condition:
+                self.size -= 1
+                self._condition.notify()
+            self._dispose([instance])
+            raise
+        with self._condition:
+            self._idle.append((instance, _timer()))
+            self._condition.notify()
 
-    def after_clear(self, name):
-        pass
+    @contextlib.contextmanager
+    def checkout(self, timeout=None):
+        instance = self.acquire(timeout)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def clear(self):
+        """
+        Drops and disposes all idle instances.
+        """
+        with self._condition:
+            instances = [instance for instance, _ in self._idle]
+            self._idle.clear()
+            self.size -= len(instances)
+            self._condition.notify_all()
+        self._dispose(instances)
 
 
-class Proxy(object):
+class DISingletonStore(dict):
     """
-    Will replaced with the real proxy instance
+    The store of the singleton instances of a container. Instances of
+    configurations with the `evictable` option are added with :meth:`add`,
+    so subclasses can limit how long they are kept. This type keeps all
+    instances until :meth:`DIContainer.clear` is called.
+
+    Subclasses call :attr:`on_evict` with the name of each evicted
+    instance. The container reports it as `after_clear` event.
     """
 
-    def __init__(self, factory_method):
-        raise NotImplementedError()
+    #: called with the name of an evicted instance.
+    on_evict = None
 
+    def add(self, name, instance, evictable=False):
+        """
+        Stores the singleton `instance` of the configuration `name`.
 
-default_config = {
-    'name': None,
-    'type': None,
-    'args': (),
-    'kwargs': {},
-    'singleton': False,
-    'lazy': True,
-    'properties': {},
-    'assert_type': None,
-    'factory_method': None,
-    'alias': [],
-    'mixins': []
-}
+        :param evictable: whether the instance may be evicted by the
+                          store.
+        :type evictable: bool
+        """
+        self[name] = instance
 
+    def _after_fork(self, keep):
+        """
+        Drops the instances for which `keep(name)` returns `False` in a
+        forked child process.
 
-class MissingConfigurationError(KeyError, AttributeError):
-    """
-    Exception that will be raised if the requested key is not configured.
-    """
+        :returns: the dropped names.
+        :rtype: list
+        """
+        names = [name for name in list(dict.keys(self)) if not keep(name)]
+        for name in names:
+            self.pop(name, None)
+        return names
 
-    def __init__(self, key):
-        super(MissingConfigurationError, self).__init__(
-            'No configuration named "%s". Please specify in '
-            'settings or register at runtime.' % key)
+    def _evicted(self, names):
+        on_evict = self.on_evict
+        if on_evict is None:
+            return
+        for name in names:
+            _logger.debug('evicted singleton %s.', name)
+            on_evict(name)
 
 
-class DIConfigurationError(Exception):
+class LRUSingletonStore(DISingletonStore):
     """
-    Error that will be raised if there is an invalid configuration given
-    for the di container.
+    Keeps at most `max_size` evictable instances and evicts the least
+    recently resolved one when another is added. Other instances are not
+    counted and never evicted.
     """
 
+    def __init__(self, max_size=128):
+        super(LRUSingletonStore, self).__init__()
+        self.max_size = max_size
+        self._order = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, default=None):
+        value = dict.get(self, name, default)
+        if name in self._order:
+            with self._lock:
+                if name in self._order:
+                    # move to the end, the most recently used.
+                    self._order[name] = self._order.pop(name)
+        return value
 
-class DIConfig(namedtuple('DIConfigBase', default_config.keys())):
+    def add(self, name, instance, evictable=False):
+        if not evictable:
+            self[name] = instance
+            return
+        with self._lock:
+            dict.__setitem__(self, name, instance)
+            self._order.pop(name, None)
+            self._order[name] = None
+            evicted = []
+            while len(self._order) > self.max_size:
+                evicted_name, _ = self._order.popitem(last=False)
+                dict.pop(self, evicted_name, None)
+                evicted.append(evicted_name)
+        self._evicted(evicted)
+
+    def __setitem__(self, name, instance):
+        with self._lock:
+            self._order.pop(name, None)
+            dict.__setitem__(self, name, instance)
+
+    def __delitem__(self, name):
+        with self._lock:
+            self._order.pop(name, None)
+            dict.__delitem__(self, name)
+
+    def pop(self, name, *default):
+        with self._lock:
+            self._order.pop(name, None)
+            return dict.pop(self, name, *default)
+
+    def clear(self):
+        with self._lock:
+            self._order.clear()
+            dict.clear(self)
+
+    def _after_fork(self, keep):
+        # another thread of the parent could have held the lock.
+        self._lock = threading.Lock()
+        return super(LRUSingletonStore, self)._after_fork(keep)
+
+
+class WeakSingletonStore(DISingletonStore):
     """
-    This type is used for the internal configuration. Each configuration dict
-    becomes passed into an instance of this class.
+    Keeps weak references to the evictable instances, so they are evicted
+    as soon as nothing else uses them. Instances that can not be weakly
+    referenced are kept like the others.
+
+    Weakly referenced instances are found by :meth:`get`, `in` and `[]`,
+    but are not listed by the other dictionary methods. The `after_clear`
+    event of an evicted instance is called by the garbage collector, so
+    it may be called in any thread.
     """
 
-    def __new__(cls, **kwargs):
-        type_ = kwargs.get('type')
-        if not type_:
-            raise ValueError("'type' argument is required.")
-        cls_kwargs = copy(default_config)
-        cls_kwargs.update(kwargs)
-        return super(DIConfig, cls).__new__(cls, **cls_kwargs)
+    def __init__(self):
+        super(WeakSingletonStore, self).__init__()
+        self._refs = {}
+
+    def get(self, name, default=None):
+        value = dict.get(self, name, _MISSING)
+        if value is not _MISSING:
+            return value
+        ref = self._refs.get(name)
+        if ref is not None:
+            value = ref()
+            if value is not None:
+                return value
+        return default
+
+    def add(self, name, instance, evictable=False):
+        if not evictable:
+            self[name] = instance
+            return
+        try:
+            ref = weakref.ref(instance, self._callback(name))
+        except TypeError:
+            _logger.debug(
+                'singleton %s can not be weakly referenced. keeping it.',
+                name)
+            self[name] = instance
+            return
+        dict.pop(self, name, None)
+        self._refs[name] = ref
+
+    def _callback(self, name):
+        store_ref = weakref.ref(self)
+
+        def callback(ref):
+            store = store_ref()
+            if store is not None and store._refs.get(name) is ref:
+                del store._refs[name]
+                store._evicted([name])
+        return callback
+
+    def __contains__(self, name):
+        return self.get(name, _MISSING) is not _MISSING
+
+    def __getitem__(self, name):
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
 
+    def __setitem__(self, name, instance):
+        self._refs.pop(name, None)
+        dict.__setitem__(self, name, instance)
 
-class DIConfigManager(dict):
-    """
-    This type is used for the internal wrapping of the settings dictionary
-    to control reading and temporarily delivering deviant settings for a name.
-    """
-    context_settings = None
+    def __delitem__(self, name):
+        if self._refs.pop(name, None) is None:
+            dict.__delitem__(self, name)
+        else:
+            dict.pop(self, name, None)
 
-    def __init__(self, settings_dict):
-        settings = OrderedDict(settings_dict.copy())
-        for key, config in settings.items():
-            if not isinstance(settings[key], DIConfig):
-                # create an instance of DIConfig for each config element.
-                # that makes it easier to work with it later.
-                settings[key] = DIConfig(name=key, **config)
-                _logger.debug(
-                    'Created DIConfig for configuration key %s.', key)
-        super(DIConfigManager, self).__init__(settings)
+    def pop(self, name, *default):
+        ref = self._refs.pop(name, None)
+        value = ref() if ref is not None else None
+        if value is not None:
+            return value
+        return dict.pop(self, name, *default)
 
-    def apply_context(self, settings):
-        self.context_settings = settings
+    def clear(self):
+        self._refs.clear()
+        dict.clear(self)
 
-    def reset_context(self):
-        self.context_settings = None
+    def _after_fork(self, keep):
+        names = [name for name in list(self._refs) if not keep(name)]
+        for name in names:
+            self._refs.pop(name, None)
+        return names + super(WeakSingletonStore, self)._after_fork(keep)
+
+
+#: the containers prepared by :meth:`DIContainer.prefork`.
+_fork_containers = weakref.WeakSet()
 
-    def __getitem__(self, key):
-        if self.context_settings and key in self.context_settings:
-            return self.context_settings[key]
-        return super(DIConfigManager, self).__getitem__(key)
+
+def _after_fork_in_child():
+    for container in list(_fork_containers):
+        try:
+            container.after_fork()
+        except Exception:
+            _logger.exception('could not reinitialize container after fork.')
+
+
+try:
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+except AttributeError:  # < 3.7 or no fork support
+    _register_at_fork = False
+else:
+    _register_at_fork = True
 
 
 class DIContainer(object):
@@ -180,6 +1963,7 @@ class DIContainer(object):
     """
 
     __default_value_resolver_classes = {}
+    __default_scope_classes = {}
 
     def __init__(self, settings, *args, **kwargs):
         """
@@ -188,17 +1972,59 @@ class DIContainer(object):
         :param settings: The dictionary, containing the container-
                          configuration.
         :type settings: dict
+        :param eager_workers: if given, the non-lazy configurations are
+                              created on a thread pool with this number of
+                              workers, respecting their relations.
+        :type eager_workers: int
+        :param validate: check the relations of the configurations before
+                         creating the non-lazy ones. see :meth:`validate`.
+        :type validate: bool
+        :param warmup: import all types and modules before creating the
+                       non-lazy configurations. an int is used as the
+                       number of threads. see :meth:`warmup`.
+        :type warmup: bool|int
+        :param compiled: a module - or its name - generated by
+                         :meth:`compile_settings`. its settings are used
+                         if `settings` is `None`.
+        :type compiled: module|str
+        :param singleton_store: the store of the singleton instances, i.e.
+                                a :class:`LRUSingletonStore` to limit the
+                                instances of `evictable` configurations.
+        :type singleton_store: DISingletonStore|type
         """
 
         _logger.debug(
             'Container __init__ called. Begin to bootstrap this container.')
 
+        parent = kwargs.get('parent', None)
         dispatcher_type = kwargs.get('event_dispatcher', DIEventDispatcher)
 
-        self.event_dispatcher = dispatcher_type(container=self)
+        if parent is not None and 'event_dispatcher' not in kwargs:
+            # child containers get a dispatcher of the parent's type. the
+            # default dispatcher has no hooks and is created on first use.
+            dispatcher = parent._event_dispatcher
+            if dispatcher is None or type(dispatcher) is DIEventDispatcher:
+                self._event_dispatcher = None
+            else:
+                self.event_dispatcher = _create_event_dispatcher(
+                    dispatcher, self)
+        elif isinstance(dispatcher_type, (list, tuple)):
+            self.event_dispatcher = DICompositeEventDispatcher(
+                container=self, dispatchers=[
+                    type_(container=self) for type_ in dispatcher_type])
+        else:
+            self.event_dispatcher = dispatcher_type(container=self)
 
         self.settings_type = kwargs.get('settings_type', DIConfigManager)
 
+        # a module generated by `compile_settings`. its settings are used
+        # if no settings are given.
+        compiled = kwargs.get('compiled')
+        if isinstance(compiled, string_types):
+            compiled = self.import_module(compiled)
+        if settings is None and compiled is not None:
+            settings = compiled.SETTINGS
+
         # If the given settings does not have the needed settings_type
         # wrap them with it.
         if isinstance(settings, self.settings_type):
@@ -206,15 +2032,84 @@ class DIContainer(object):
         else:
             self.settings = self.settings_type(settings)
 
-        self.singletons = {}
-        self.parent = kwargs.get('parent', None)
+        # the singleton instances. a `DISingletonStore` type or instance
+        # can limit how long the evictable ones are kept.
+        store = kwargs.get('singleton_store', DISingletonStore)
+        if isinstance(store, type):
+            store = store()
+        store.on_evict = self._singleton_evicted
+        self.singletons = store
+        self.parent = parent
+
+        # compiled resolve plans by configuration name.
+        self._plans = {}
+
+        # whether the configurations of the parent containers relate to
+        # names configured here, by name. see `_overrides_relations`. it
+        # is valid as long as the registrations of this and the parent
+        # containers are `_inherited_cache_version`.
+        self._inherited_cache = {}
+        self._inherited_cache_version = 0
+        self._registrations = 0
+        self._async_plans = {}
+
+        # futures of singletons currently created by `resolve_async`.
+        self._async_pending = {}
+
+        # guard the creation of singletons, so each becomes created
+        # only once. the locks are created per name.
+        self.thread_safe = kwargs.get(
+            'thread_safe', parent.thread_safe if parent is not None else True)
+        self._singleton_locks = {}
+        self._singleton_lock_owners = {}
+        self._singleton_lock_waiting = {}
+        # the names each thread holds the lock of, in acquiring order.
+        self._singleton_lock_held = {}
+        self._locks_lock = threading.Lock()
+
+        # the scopes of the `scope` option by key. created on first use.
+        self._scopes = {}
+
+        # object pools of the configurations with the `pool` option.
+        self._pools = {}
+
+        # set the proxy type name. the type is resolved once.
+        self.proxy_type_name = kwargs.get(
+            'proxy_type_name', parent.proxy_type_name if parent is not None
+            else 'di.Proxy')
+
+        # the registrations collected by `batch`, per thread and task.
+        self._batch = _ContextLocal('di_batch')
+
+        # resolved types by (python_name, mixins). shared with the parent.
+        if parent is not None and 'type_cache_size' not in kwargs:
+            self._type_cache = parent._type_cache
+        else:
+            self._type_cache = DITypeCache(
+                kwargs.get('type_cache_size', 1024))
+
+        # configuration names by each type of their types mro. built on
+        # the first lookup by type.
+        self._reset_type_index()
+        self._type_index_lock = threading.Lock()
 
         # assign default resolvers. better use a resolver instance.
-        # maybe remove this in some version.
-        self.value_resolvers = dict(
-            (key, k.as_resolve_method(self))
-            for key, k in self.__default_value_resolver_classes.items()
-        )
+        # maybe remove this in some version. created on first use.
+        self._value_resolvers = None
+        # resolver classes by key. used to parse string values into
+        # resolver instances once. shared with the parent.
+        if parent is not None and 'value_resolvers' not in kwargs:
+            self._value_resolver_classes = parent._value_resolver_classes
+            if parent._value_resolvers is not None:
+                # the keys replaced by the deprecated `value_resolvers` of
+                # the parent are missing in the shared classes.
+                self.value_resolvers.update(
+                    (key, resolver)
+                    for key, resolver in parent._value_resolvers.items()
+                    if key not in self._value_resolver_classes)
+        else:
+            self._value_resolver_classes = dict(
+                self.__default_value_resolver_classes)
 
         # check if individual value_resolves are given. update the internal
         # resolver dictionary with this values.
@@ -225,19 +2120,82 @@ class DIContainer(object):
                 'Use a Resolver instance in your configuration.',
                 DeprecationWarning)
             self.value_resolvers.update(kwargs.get('value_resolvers'))
+            for key in kwargs.get('value_resolvers'):
+                self._value_resolver_classes.pop(key, None)
+
+        # generated functions by configuration name.
+        self._compiled = {}
+        if compiled is not None:
+            self._load_compiled(compiled)
+
+        if kwargs.get('validate'):
+            self.validate()
+
+        warmup = kwargs.get('warmup')
+        if warmup:
+            self.warmup(workers=None if warmup is True else warmup)
 
         _logger.debug('checking for non-lazy configrations.')
-        for key, conf in self.settings.items():
-            if not conf.lazy:
-                _logger.debug(
-                    'found non-lazy configuration %s. resovling it.', key)
-                self.resolve(key)
+        eager_workers = kwargs.get('eager_workers')
+        if eager_workers:
+            self._resolve_non_lazy_parallel(eager_workers)
+        else:
+            for key, conf in self.settings.items():
+                if not conf.lazy:
+                    _logger.debug(
+                        'found non-lazy configuration %s. resovling it.', key)
+                    self.resolve(key)
 
-        # set the proxy type name
-        self.proxy_type_name = kwargs.get(
-            'proxy_type_name', 'lazy_object_proxy.Proxy')
+        if self._on_initialized is not None:
+            self._on_initialized()
+
+    @property
+    def event_dispatcher(self):
+        if self._event_dispatcher is None:
+            self._event_dispatcher = DIEventDispatcher(container=self)
+        return self._event_dispatcher
+
+    @event_dispatcher.setter
+    def event_dispatcher(self, dispatcher):
+        """
+        Sets the event dispatcher and binds the hooks it overrides. Hooks
+        that are not overridden are not called at all.
+        """
+        self._event_dispatcher = dispatcher
+        for hook in DIEventDispatcher.hooks:
+            attribute = '_on_%s' % hook
+            value = _get_event_hook(dispatcher, hook)
+            # hooks that are not overridden fall back to the class
+            # attributes, so containers have less instance attributes.
+            if value is not None or attribute in self.__dict__:
+                setattr(self, attribute, value)
+
+    @property
+    def value_resolvers(self):
+        """
+        The resolve functions by key. Better use a resolver instance.
+        """
+        if self._value_resolvers is None:
+            self._value_resolvers = dict(
+                (key, k.as_resolve_method(self))
+                for key, k in self.__default_value_resolver_classes.items())
+        return self._value_resolvers
+
+    @value_resolvers.setter
+    def value_resolvers(self, value_resolvers):
+        self._value_resolvers = value_resolvers
 
-        self.event_dispatcher.initialized()
+    @property
+    def proxy_type_name(self):
+        """
+        The python name of the proxy type used for lazy resolving.
+        """
+        return self._proxy_type_name
+
+    @proxy_type_name.setter
+    def proxy_type_name(self, proxy_type_name):
+        self._proxy_type_name = proxy_type_name
+        self._proxy_type = None
 
     @classmethod
     def add_value_resolver(cls, resolver_class):
@@ -248,6 +2206,59 @@ class DIContainer(object):
         cls.__default_value_resolver_classes[key] = \
             resolver_class
 
+    @classmethod
+    def compile_settings(cls, settings):
+        """
+        Generates the source of a python module with a function for each
+        configuration, that creates the instance with direct imports,
+        constructor calls and inlined `rel`, `mod`, `ref`, `factory` and
+        `attr` values. Pass the module as `compiled` to the container to
+        use the functions instead of interpreting the configuration::
+
+            with open('myapp/di_compiled.py', 'w') as module:
+                module.write(DIContainer.compile_settings(settings))
+
+            container = DIContainer(None, compiled='myapp.di_compiled')
+
+        Configurations with mixins, lazy resolvers or own resolvers are
+        part of the modules settings, but resolved as usual.
+
+        :param settings: the configurations by name.
+        :type settings: dict
+
+        :raises: DIConfigurationError if a value can not be written as
+                 python literal.
+        :rtype: str
+        """
+        return _SettingsCompiler(
+            dict(cls.__default_value_resolver_classes)).compile(settings)
+
+    def _load_compiled(self, module):
+        """
+        Loads the functions of a module generated by
+        :meth:`compile_settings`. They are used for a configuration as long
+        as it equals the compiled one.
+        """
+        for key, resolver_class in _COMPILED_RESOLVERS.items():
+            if self._value_resolver_classes.get(key) is not resolver_class:
+                _logger.warning(
+                    'the resolver for "%s" is replaced. not using the '
+                    'compiled module %s.', key, module.__name__)
+                return
+        for name, (type_, create, build) in module.FACTORIES.items():
+            conf = DIConfig(name=name, **module.SETTINGS[name])
+            self._compiled[name] = (conf, type_, create, build)
+
+    @classmethod
+    def add_scope(cls, scope_class):
+        """
+        Registers a scope type for the `scope` configuration option under
+        its key. Affects containers created afterwards.
+
+        :type scope_class: type
+        """
+        cls.__default_scope_classes[scope_class.key] = scope_class
+
     @staticmethod
     def import_module(name, package=None):
         """
@@ -270,6 +2281,47 @@ class DIContainer(object):
         The types module can dynamicly be added to the path this way:
         * /tmp/dir_with_module/:module.Person
 
+        Resolved types are cached by :code:`python_name` and
+        :code:`mixins`, so the same configuration always results in the
+        same type object. Types with mixins are kept until
+        :meth:`clear_type_cache` is called.
+
+        :param python_name: The full name of the type to reslove.
+        :type python_name: str|unicode
+        :param mixins: tist or tuple of types to mixin.
+        :type mixins: list|tuple
+        :returns: type
+        """
+        if not mixins and not isinstance(python_name, string_types + (
+                list, tuple)):
+            # already a type. nothing to resolve or to cache.
+            return python_name
+
+        try:
+            key = (
+                tuple(python_name) if isinstance(python_name, list)
+                else python_name,
+                tuple(mixins) if mixins else ())
+            hash(key)
+        except TypeError:
+            # unhashable type configuration. do not cache it.
+            return self._import_type(python_name, mixins)
+
+        type_ = self._type_cache.get(key)
+        if type_ is None:
+            # computed mixin types are never dropped. a new one would
+            # break isinstance checks of existing instances.
+            type_ = self._type_cache.set(
+                key, self._import_type(python_name, mixins),
+                pinned=bool(mixins))
+        return type_
+
+    def _import_type(self, python_name, mixins=None):
+        """
+        Imports the type for :code:`python_name` and combines it with the
+        given :code:`mixins`. Use :meth:`_resolve_type` to make use of the
+        type cache.
+
         :param python_name: The full name of the type to reslove.
         :type python_name: str|unicode
         :param mixins: tist or tuple of types to mixin.
@@ -344,24 +2396,25 @@ class DIContainer(object):
         value = value_conf
         if isinstance(value, Resolver):
             return value.resolve(self)
-        if isinstance(value_conf, string_types):
-            for key, resolver in self.value_resolvers.items():
-                if value_conf.startswith('%s:' % key):
-                    return resolver(value_conf)
+        if isinstance(value_conf, string_types) and ':' in value_conf:
+            resolver = self.value_resolvers.get(value_conf.split(':', 1)[0])
+            if resolver is not None:
+                return resolver(value_conf)
         return value
 
-    def _resolve_args(self, conf_args, conf_kwargs):
+    @staticmethod
+    def _split_args(conf_args, conf_kwargs):
         """
-        resolves the arguments off the container configuration.
+        normalizes the `args` and `kwargs` of a configuration into a
+        sequence of positional and a dictionary of keyword values.
 
-        :param conf: value configuration.
-        :type conf: dict
+        :param conf_args: the `args` configuration value.
+        :type conf_args: list|tuple|dict
+        :param conf_kwargs: the `kwargs` configuration value.
+        :type conf_kwargs: dict
 
         :returns: (), {}
         """
-        args = []
-        kwargs = {}
-
         # copy given references of dictionaries to not change
         # references values.
         conf_args = conf_args and copy(conf_args) or ()
@@ -384,15 +2437,330 @@ class DIContainer(object):
             })
             conf_args = conf_args.pop('', tuple())
 
-        # resolve items of kwargs values.
-        for key, value_conf in conf_kwargs.items():
-            kwargs[key] = self._resolve_value(value_conf)
+        return conf_args, conf_kwargs
+
+    def _resolve_args(self, conf_args, conf_kwargs):
+        """
+        resolves the arguments off the container configuration.
+
+        :param conf: value configuration.
+        :type conf: dict
+
+        :returns: (), {}
+        """
+        args = []
+        kwargs = {}
+
+        conf_args, conf_kwargs = self._split_args(conf_args, conf_kwargs)
+
+        # resolve items of kwargs values.
+        for key, value_conf in conf_kwargs.items():
+            kwargs[key] = self._resolve_value(value_conf)
+
+        # resolve items of args values.
+        for value_conf in conf_args:
+            args.append(self._resolve_value(value_conf))
+
+        return args, kwargs
+
+    def _compile_value(self, value_conf):
+        """
+        Returns a callable without arguments that resolves the given
+        value configuration. The lookup of the matching resolver is done
+        once here and not on every call.
+
+        :param value_conf: the value to pass or resolve.
+        :type value_conf: object
+
+        :returns: callable
+        """
+        if isinstance(value_conf, string_types) and ':' in value_conf:
+            key = value_conf.split(':', 1)[0]
+            resolver_class = self._value_resolver_classes.get(key)
+            if resolver_class is not None:
+                # parse the string into a resolver instance once.
+                value_conf = resolver_class(value_conf)
+            elif self._value_resolvers is not None and \
+                    key in self._value_resolvers:
+                # only set if replaced by the deprecated `value_resolvers`.
+                return functools.partial(
+                    self._value_resolvers[key], value_conf)
+        if isinstance(value_conf, Resolver):
+            return functools.partial(value_conf.resolve, self)
+        return lambda: value_conf
+
+    def _compile_plan(self, name, conf):
+        """
+        Creates the :class:`DIResolvePlan` for the given configuration.
+        Type resolution, type assertion and the resolver lookup of all
+        args, kwargs and properties are done once here.
+
+        :param name: the name of the configuration.
+        :type name: str|unicode
+        :param conf: the configuration to compile.
+        :type conf: di.DIConfig
+
+        :rtype: di.DIResolvePlan
+        """
+        _logger.debug('compiling resolve plan for %s.', name)
+
+        compiled = self._compiled.get(name)
+        if compiled is not None and compiled[0] == conf:
+            return self._compiled_plan(name, conf, *compiled[1:])
+
+        type_ = self._resolve_type(conf.type, mixins=conf.mixins)
+
+        # assert weather the type implements the
+        # configures basetype.
+        assert_type = conf.assert_type
+        if assert_type:
+            expected_type = self._resolve_type(assert_type)
+            self._check_type(name, type_, expected_type)
+
+        if conf.factory_method:
+            factory = getattr(type_, conf.factory_method)
+        else:
+            factory = type_
+
+        conf_args, conf_kwargs = self._split_args(conf.args, conf.kwargs)
+
+        return DIResolvePlan(
+            conf=conf,
+            type_=type_,
+            factory=factory,
+            args=tuple(map(self._compile_value, conf_args)),
+            kwargs=tuple(
+                (key, self._compile_value(value_conf))
+                for key, value_conf in conf_kwargs.items()),
+            properties=tuple(
+                (key, self._compile_value(value_conf))
+                for key, value_conf in conf.properties.items()),
+        )
+
+    def _compiled_plan(self, name, conf, type_, create, build):
+        """
+        Creates the :class:`DICompiledResolvePlan` for the given
+        configuration and its generated functions.
+
+        :rtype: di.DICompiledResolvePlan
+        """
+        if conf.assert_type:
+            self._check_type(
+                name, type_, self._resolve_type(conf.assert_type))
+        if conf.factory_method:
+            factory = getattr(type_, conf.factory_method)
+        else:
+            factory = type_
+        return DICompiledResolvePlan(
+            conf, type_, factory, self, create, build)
+
+    def _reset_type_index(self):
+        """
+        Drops the type index. It will be rebuilt on the next lookup.
+        """
+        self._indexed_types = OrderedDict()
+        self._type_index = {}
+        self._type_index_pending = deque(self.settings.keys())
+
+    def _index_type(self, name, type_):
+        """
+        Adds the configuration name to the index of each type in the mro
+        of `type_`.
+        """
+        if not inspect.isclass(type_):
+            return
+        for base_type in inspect.getmro(type_):
+            self._type_index.setdefault(base_type, []).append(name)
+
+    def _names_for_type(self, base_type):
+        """
+        Returns the names of all configurations whose type is a subclass
+        of `base_type` in order of their registration.
+
+        :param base_type: the base type to lookup.
+        :type base_type: type
+
+        :rtype: tuple
+        """
+        with self._type_index_lock:
+            rebuild = False
+            pending = self._type_index_pending
+            while pending:
+                name = pending[0]
+                # dict.get to skip the context settings.
+                conf = self.settings.get(name)
+                if conf is not None:
+                    type_ = self._resolve_type(conf.type, mixins=conf.mixins)
+                    if name in self._indexed_types:
+                        # a replaced configuration. keep its position.
+                        rebuild = True
+                    self._indexed_types[name] = type_
+                    if not rebuild:
+                        self._index_type(name, type_)
+                pending.popleft()
+            if rebuild:
+                self._type_index = {}
+                for name, type_ in self._indexed_types.items():
+                    self._index_type(name, type_)
+
+            if isinstance(base_type, ABCMeta):
+                # virtual subclasses are not part of the mro.
+                return tuple(
+                    name for name, type_ in self._indexed_types.items()
+                    if inspect.isclass(type_) and issubclass(type_, base_type)
+                )
+            return tuple(self._type_index.get(base_type, ()))
+
+    def _acquire_singleton_lock(self, name):
+        """
+        Acquires the lock to create the singleton `name`. Before waiting
+        for the lock the chain of waiting threads is checked, so a
+        recursive or crosswise dependency raises an error instead of
+        dead locking.
+
+        :raises: CircularDependencyError
+        :rtype: threading.Lock
+        """
+        ident = get_ident()
+        with self._locks_lock:
+            lock = self._singleton_locks.get(name)
+            if lock is None:
+                lock = self._singleton_locks[name] = threading.Lock()
+            # follow the singletons created by each owning thread
+            # after the one of the chain, and what the thread waits for.
+            chain = [name]
+            owner = self._singleton_lock_owners.get(name)
+            while owner is not None:
+                held = self._singleton_lock_held[owner]
+                chain.extend(held[held.index(chain[-1]) + 1:])
+                if owner == ident:
+                    chain.append(name)
+                    raise CircularDependencyError(chain)
+                waiting_for = self._singleton_lock_waiting.get(owner)
+                if waiting_for is None:
+                    break
+                chain.append(waiting_for)
+                owner = self._singleton_lock_owners.get(waiting_for)
+            self._singleton_lock_waiting[ident] = name
+        lock.acquire()
+        with self._locks_lock:
+            del self._singleton_lock_waiting[ident]
+            self._singleton_lock_owners[name] = ident
+            self._singleton_lock_held.setdefault(ident, []).append(name)
+        return lock
+
+    def _release_singleton_lock(self, name, lock):
+        with self._locks_lock:
+            ident = self._singleton_lock_owners.pop(name)
+            held = self._singleton_lock_held[ident]
+            held.remove(name)
+            if not held:
+                del self._singleton_lock_held[ident]
+        lock.release()
+
+    def _get_conf(self, name):
+        """
+        Returns the name and the configuration for the given name or
+        alias name.
+
+        :raises: MissingConfigurationError
+        :rtype: tuple
+        """
+        try:
+            # load information to create the instance
+            return name, self.settings[name]
+        except KeyError:
+            # name could not ne found. let us try to
+            # find it by it's aliasname.
+            try:
+                key = self.settings.resolve_alias(name)
+            except KeyError:
+                # no configuration with this name as alias could
+                # be found. so we reraise the origin exception.
+                raise MissingConfigurationError(name)
+            _logger.debug(
+                "%s could not be found. found it as alias for %s.",
+                name, key)
+            return key, self.settings[key]
+
+    def _resolve_non_lazy_parallel(self, workers):
+        """
+        Resolves all non-lazy configurations on a thread pool. A
+        configuration is resolved after all non-lazy configurations it
+        relates to. All errors are collected and raised together.
+
+        :param workers: the maximum number of threads.
+        :type workers: int
 
-        # resolve items of args values.
-        for value_conf in conf_args:
-            args.append(self._resolve_value(value_conf))
+        :raises: InitializationError
+        """
+        from concurrent.futures import (
+            ThreadPoolExecutor, wait, FIRST_COMPLETED)
+
+        names = [key for key, conf in self.settings.items() if not conf.lazy]
+        dependents = dict((name, []) for name in names)
+        remaining = {}
+        graph = self.dependency_graph()
+        for name in names:
+            dependencies = [
+                dep for dep in graph.dependencies(name)
+                if dep != name and dep in dependents]
+            remaining[name] = len(dependencies)
+            for dependency in dependencies:
+                dependents[dependency].append(name)
+
+        errors = OrderedDict()
+        skipped = set()
+
+        def skip(name):
+            for dependent in dependents[name]:
+                if dependent not in skipped:
+                    skipped.add(dependent)
+                    skip(dependent)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = dict(
+                (executor.submit(self.resolve, name), name)
+                for name in names if not remaining[name])
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        errors[name] = error
+                        skip(name)
+                        continue
+                    _logger.debug('created non-lazy configuration %s.', name)
+                    for dependent in dependents[name]:
+                        remaining[dependent] -= 1
+                        if not remaining[dependent] and \
+                                dependent not in skipped:
+                            futures[executor.submit(
+                                self.resolve, dependent)] = dependent
+
+        circular = [
+            name for name in names
+            if remaining[name] and name not in skipped]
+        for name in circular:
+            errors[name] = CircularDependencyError(circular)
+
+        if errors:
+            raise InitializationError(
+                errors, [name for name in names if name in skipped])
+
+    def _get_plan(self, name, conf):
+        """
+        Returns the cached :class:`DIResolvePlan` for the given
+        configuration or compiles a new one.
 
-        return args, kwargs
+        :rtype: di.DIResolvePlan
+        """
+        plan = self._plans.get(name)
+        if plan is None or plan.conf is not conf:
+            plan = self._compile_plan(name, conf)
+            self._plans[name] = plan
+        return plan
 
     def _check_type(self, conf_name, type_, expected):
         """
@@ -414,6 +2782,36 @@ class DIContainer(object):
                 % (type_, expected, conf_name)
             )
 
+    def _create(self, name, conf, instance_args, instance_kwargs):
+        """
+        Creates, builds up and - if configured - stores the instance for
+        the configuration `name`.
+
+        :rtype: object
+        """
+        plan = self._get_plan(name, conf)
+
+        # check if we got some arguments to pass into the
+        # new instance constructor.
+        if instance_args or instance_kwargs:
+            obj = plan.factory(*instance_args, **instance_kwargs)
+        else:
+            obj = plan()
+
+        obj = self.build_up(name, obj)
+
+        # save instance to singleton container
+        if conf.singleton:
+            if conf.evictable:
+                self.singletons.add(name, obj, True)
+            else:
+                self.singletons[name] = obj
+
+        if self._on_after_resolve is not None:
+            self._on_after_resolve(name=name, instance=obj)
+
+        return obj
+
     def get_proxy_type(self):
         """
         Returns the Proxy type, used for lazy resolving.
@@ -421,15 +2819,17 @@ class DIContainer(object):
         :return: The type used as Proxy.
         :rtype: di.Proxy
         """
+        proxy_type = self._proxy_type
+        if proxy_type is not None:
+            return proxy_type
         try:
             proxy_type = self._resolve_type(self.proxy_type_name)
         except ImportError:
-            # We do not provide lazy-object-proxy because of different licences.
             raise ImportError(
                 'got an error while importing the proxy type `%s`. '
-                'make sure you installed `lazy-object-proxy` or another '
-                'lazy object implementation. (i.e. django.utils.functional'
-                '.SimpleLazyObject).' % self.proxy_type_name)
+                'make sure it is installed or use the default `di.Proxy`.'
+                % self.proxy_type_name)
+        self._proxy_type = proxy_type
         return proxy_type
 
     # ---------------------------
@@ -451,13 +2851,24 @@ class DIContainer(object):
         :type replace: bool
         """
 
-        self.event_dispatcher.before_register(name=name, settings=settings)
-
         # check if this function is used as decorator. the indicator is,
         # calling the function with settings but without type even leave
         # settings empty.
         is_decorator = (settings is None or (isinstance(
             settings, dict) and 'type' not in settings))
+
+        batch = self._batch.get()
+        if batch is not None and not is_decorator:
+            # registered at the end of the `batch` block.
+            if not replace and (name in batch or name in self.settings):
+                raise KeyError(
+                    'there is already a configuration with this name.')
+            batch[name] = (settings, replace)
+            return
+
+        if self._on_before_register is not None:
+            self._on_before_register(name=name, settings=settings)
+
         if is_decorator:
             def wrapper(func_or_type):
                 # register the given type.
@@ -483,7 +2894,115 @@ class DIContainer(object):
         if name in self.singletons:
             del self.singletons[name]
 
-        self.event_dispatcher.after_register(name=name, settings=conf)
+        self._plans.pop(name, None)
+        self._async_plans.pop(name, None)
+        self._type_index_pending.append(name)
+        self._registrations += 1
+
+        if self._on_after_register is not None:
+            self._on_after_register(name=name, settings=conf)
+
+    def register_many(self, settings, replace=False, validate=False):
+        """
+        Registers multiple configurations at once. All of them are checked
+        before the first one is registered, so either all or none become
+        registered. The alias index is updated once and the type index is
+        rebuilt once on the next lookup by type.
+
+        :param settings: the settings dictionaries or `DIConfig` instances
+                         by name.
+        :type settings: dict
+        :param replace: defines weather existing configurations should be
+            replaced.
+        :type replace: bool
+        :param validate: check the relations of the resulting
+                         configurations. see :meth:`validate`.
+        :type validate: bool
+
+        :raises: KeyError, ValueError, DIConfigurationError
+        """
+        self._register_many(OrderedDict(
+            (name, (conf, replace)) for name, conf in settings.items()),
+            validate)
+
+    def _register_many(self, registrations, validate=False):
+        """
+        Registers the `(settings, replace)` tuples by name.
+        """
+        existing = [
+            name for name, (_, replace) in registrations.items()
+            if not replace and name in self.settings]
+        if existing:
+            raise KeyError(
+                'there are already configurations with the names: %s.'
+                % ', '.join(existing))
+
+        confs = OrderedDict()
+        for name, (settings, _) in registrations.items():
+            if isinstance(settings, dict):
+                settings = DIConfig(name=name, **settings)
+            confs[name] = settings
+
+        if validate:
+            merged = OrderedDict(self.settings.items())
+            merged.update(confs)
+            graph = DIDependencyGraph(
+                merged, external=self._external_names())
+            cycles = graph.cycles()
+            dangling = graph.dangling()
+            if cycles or dangling:
+                raise ValidationError(cycles, dangling)
+
+        if self._on_before_register is not None:
+            for name, conf in confs.items():
+                self._on_before_register(name=name, settings=conf)
+
+        if hasattr(self.settings, 'update_configs'):
+            self.settings.update_configs(confs)
+        else:
+            for name, conf in confs.items():
+                self.settings[name] = conf
+
+        for name in confs:
+            self.singletons.pop(name, None)
+            self._plans.pop(name, None)
+            self._async_plans.pop(name, None)
+        self._type_index_pending.extend(confs)
+        self._registrations += 1
+
+        if self._on_after_register is not None:
+            for name, conf in confs.items():
+                self._on_after_register(name=name, settings=conf)
+
+    @contextlib.contextmanager
+    def batch(self, validate=False):
+        """
+        Collects the :meth:`register` calls of the block and registers
+        them with :meth:`register_many` at its end. If the block raises,
+        nothing is registered. The collected configurations can not be
+        resolved before the block ends. Nested blocks are part of the
+        outermost one.
+
+        Usage::
+
+            with container.batch():
+                for plugin in plugins:
+                    container.register(plugin.name, plugin.settings)
+
+        :param validate: check the relations of the resulting
+                         configurations. see :meth:`validate`.
+        :type validate: bool
+        """
+        if self._batch.get() is not None:
+            yield
+            return
+        registrations = OrderedDict()
+        token = self._batch.set(registrations)
+        try:
+            yield
+        finally:
+            self._batch.reset(token)
+        self._register_many(registrations, validate)
 
     def resolve(self, name, *instance_args, **instance_kwargs):
         """
@@ -494,81 +3013,221 @@ class DIContainer(object):
 
         :returns: object
         """
+        # fast path for existing singletons without hooks to call.
+        if self._on_before_resolve is None and \
+                self._on_after_resolve_singleton is None:
+            obj = self.singletons.get(name, _MISSING)
+            if obj is not _MISSING:
+                return obj
+
+        # names not configured here use the configuration of the parent.
+        inherited = None
+        if self.parent is not None and self._is_inherited(name):
+            inherited = self._get_inherited_conf(name)
+            if inherited is None:
+                return self.parent.resolve(
+                    name, *instance_args, **instance_kwargs)
 
-        self.event_dispatcher.before_resolve(name=name)
+        if self._on_before_resolve is not None:
+            self._on_before_resolve(name=name)
 
-        # if there is no string provided as name, di will try to
-        # resolve the first configured instance with the given type.
-        if not isinstance(name, string_types):
-            for obj in self.resolve_many(
-                    name, *instance_args, **instance_kwargs):
+        try:
+            # if there is no string provided as name, di will try to
+            # resolve the first configured instance with the given type.
+            if not isinstance(name, string_types):
+                for obj in self.resolve_many(
+                        name, *instance_args, **instance_kwargs):
+                    return obj
+                else:
+                    raise MissingConfigurationError(str(name))
+
+            # check if there already is a singleton instance
+            # for this name. a single lookup, the store may evict it.
+            obj = self.singletons.get(name, _MISSING)
+            if obj is not _MISSING:
+                return self._singleton_hit(name, obj)
+
+            key, conf = inherited or self._get_conf(name)
+            if key != name:
+                # found the name for the given alias. so check if
+                # there is a singleton instance for it.
+                name = key
+                obj = self.singletons.get(name, _MISSING)
+                if obj is not _MISSING:
+                    return self._singleton_hit(name, obj)
+
+            if conf.scope is not None:
+                store = self._get_scope_store(name, conf)
+                obj = store.get(name, _MISSING)
+                if obj is not _MISSING:
+                    return self._singleton_hit(name, obj)
+                obj = self._create(name, conf, instance_args, instance_kwargs)
+                store[name] = obj
                 return obj
-            else:
-                raise MissingConfigurationError(str(name))
 
-        # check if there already is a singleton instance
-        # for this name
-        if name in self.singletons:
-            return self.singletons[name]
+            if conf.singleton and self.thread_safe:
+                lock = self._acquire_singleton_lock(name)
+                try:
+                    # another thread could have created it while waiting.
+                    obj = self.singletons.get(name, _MISSING)
+                    if obj is not _MISSING:
+                        return self._singleton_hit(name, obj)
+                    return self._create(
+                        name, conf, instance_args, instance_kwargs)
+                finally:
+                    self._release_singleton_lock(name, lock)
+
+            return self._create(name, conf, instance_args, instance_kwargs)
+        except Exception as error:
+            if self._on_after_resolve_error is not None:
+                self._on_after_resolve_error(name=name, error=error)
+            raise
+
+    def _is_inherited(self, name):
+        """
+        Returns whether `name` is neither configured nor an alias in this
+        container, so it has to be resolved by the parent container.
 
+        :rtype: bool
+        """
+        if not isinstance(name, string_types) or name in self.singletons:
+            return False
         try:
-            # load information to create the instance
-            conf = self.settings[name]
+            self.settings[name]
         except KeyError:
-            # name could not ne found. let us try to
-            # find it by it's aliasname.
-            settings = self.settings
-            settings_iter = (settings.items if py3 else settings.iteritems)
-            for key, conf in settings_iter():
-                if name in conf.alias:
-                    _logger.debug(
-                        "%s could not be found. found it as alias for %s.",
-                        name, key)
-                    name = key
-                    break
-            else:
-                # no configuration with this name as alias could
-                # be found. so we reraise the origin exception.
-                raise MissingConfigurationError(name)
-
-            # found the name for the given alias. so check if
-            # there is a singleton instance for it.
-            if name in self.singletons:
-                return self.singletons[name]
-
-        type_ = self._resolve_type(conf.type, mixins=conf.mixins)
-
-        # assert weather the type implements the
-        # configures basetype.
-        assert_type = conf.assert_type
-        if assert_type:
-            expected_type = self._resolve_type(assert_type)
-            self._check_type(name, type_, expected_type)
-
-        # check if we got some arguments to pass into the
-        # new instance constructor.
-        if instance_args or instance_kwargs:
-            _args, _kwargs = (instance_args, instance_kwargs)
-        else:
-            # resolve the arguments to pass into the constructor
-            _args, _kwargs = self._resolve_args(conf.args, conf.kwargs)
+            try:
+                self.settings.resolve_alias(name)
+            except KeyError:
+                return True
+        return False
 
-        # create the instance
-        if conf.factory_method:
-            obj = getattr(type_, conf.factory_method)(*_args, **_kwargs)
-        else:
-            obj = type_(*_args, **_kwargs)
+    def _find_conf(self, name):
+        """
+        Returns the container that configures the given name or alias -
+        this or the nearest parent container - the name and the
+        configuration.
 
-        obj = self.build_up(name, obj)
+        :raises: MissingConfigurationError
+        :rtype: tuple
+        """
+        container = self
+        while True:
+            try:
+                return (container,) + container._get_conf(name)
+            except MissingConfigurationError:
+                container = container.parent
+                if container is None:
+                    raise
 
-        # save instance to singleton container
-        if conf.singleton:
-            self.singletons[name] = obj
+    def _get_inherited_conf(self, name):
+        """
+        Returns the name and the configuration of a parent container for
+        the name or alias `name`, which is not configured here, to create
+        it in this container. Returns `None` if the parent should resolve
+        it: if it does not relate - directly or indirectly - to a name
+        configured here, or if it is not configured at all. Scoped
+        configurations are always created here, so the active scope of
+        this container is used.
+
+        :rtype: tuple|None
+        """
+        try:
+            owner, key, conf = self.parent._find_conf(name)
+        except MissingConfigurationError:
+            return None
+        if conf.scope is None and \
+                not self._overrides_relations(owner, key, conf):
+            return None
+        return key, conf
+
+    def _overrides_relations(self, owner, key, conf):
+        """
+        Returns whether this container - or a container between this one
+        and the parent `owner` - configures a name the configuration `key`
+        of `owner` relates to, directly or indirectly. The result is
+        cached until a configuration is registered here or in a parent
+        container.
 
-        self.event_dispatcher.after_resolve(name=name, instance=obj)
+        :rtype: bool
+        """
+        version = 0
+        container = self
+        while container is not None:
+            version += container._registrations
+            container = container.parent
+        if version != self._inherited_cache_version:
+            self._inherited_cache.clear()
+            self._inherited_cache_version = version
+
+        cached = self._inherited_cache.get(key)
+        if cached is not None and cached[0] is conf:
+            return cached[1]
+
+        overrides = False
+        seen = set([key])
+        pending = [conf]
+        while pending and not overrides:
+            for _, target, _ in _get_relations(pending.pop()):
+                container = self
+                while container is not owner:
+                    if not container._is_inherited(target):
+                        overrides = True
+                        break
+                    container = container.parent
+                if overrides:
+                    break
+                if target in seen:
+                    continue
+                seen.add(target)
+                try:
+                    pending.append(owner._find_conf(target)[2])
+                except MissingConfigurationError:
+                    pass
+
+        # context settings can override names temporarily.
+        if getattr(self.settings, 'context_settings', None) is None:
+            self._inherited_cache[key] = (conf, overrides)
+        return overrides
+
+    def _all_names_for_type(self, base_type):
+        """
+        Returns the names of this and all parent containers, which type is
+        a subclass of `base_type`. Names of a parent that are configured
+        in a child are left out.
 
+        :rtype: list
+        """
+        names = list(self._names_for_type(base_type))
+        if self.parent is None:
+            return names
+        configured = set(self.settings.keys())
+        configured.update(getattr(self.settings, 'aliases', ()))
+        container = self.parent
+        while container is not None:
+            names.extend(
+                name for name in container._names_for_type(base_type)
+                if name not in configured)
+            configured.update(container.settings.keys())
+            configured.update(getattr(container.settings, 'aliases', ()))
+            container = container.parent
+        return names
+
+    def _singleton_hit(self, name, obj):
+        """
+        Returns the existing singleton - or scoped - instance `obj` of
+        the configuration `name`.
+        """
+        if self._on_after_resolve_singleton is not None:
+            self._on_after_resolve_singleton(name=name, instance=obj)
         return obj
 
+    def _singleton_evicted(self, name):
+        """
+        Reports a singleton instance evicted by the singleton store.
+        """
+        if self._on_after_clear is not None:
+            self._on_after_clear(name=name)
+
     def resolve_many(self, base_type, *instance_args, **instance_kwargs):
         """
         Returns a generator of all instances which types is a subclass
@@ -584,13 +3243,42 @@ class DIContainer(object):
         """
         if isinstance(base_type, string_types):
             base_type = self._resolve_type(base_type)
-        for name, conf in self.settings.items():
-            instance_type = conf.type
-            if isinstance(instance_type, string_types):
-                instance_type = self._resolve_type(
-                    instance_type, mixins=conf.mixins)
-            if issubclass(instance_type, base_type):
-                yield self.resolve(name, *instance_args, **instance_kwargs)
+        for name in self._all_names_for_type(base_type):
+            yield self.resolve(name, *instance_args, **instance_kwargs)
+
+    def resolve_async(self, name, *instance_args, **instance_kwargs):
+        """
+        Resolves an object by its name like :meth:`resolve`, but awaits
+        factories returning an awaitable and resolves the related
+        configurations of the arguments and properties concurrently.
+        Concurrent resolutions of the same singleton share one creation.
+
+        Requires python 3.5 or newer.
+
+        :param name: object's name in the configuration.
+        :type name: str|unicode
+
+        :returns: coroutine
+        """
+        from di_async import resolve_async
+        return resolve_async(self, name, *instance_args, **instance_kwargs)
+
+    def resolve_many_async(self, base_type, *instance_args, **instance_kwargs):
+        """
+        Resolves all instances which types is a subclass of the given
+        `base_type` like :meth:`resolve_many`, but concurrently with
+        :meth:`resolve_async`. The coroutine returns a list.
+
+        Requires python 3.5 or newer.
+
+        :param base_type: the type every objects type should be a subclass of.
+        :type base_type: str | type
+
+        :returns: coroutine
+        """
+        from di_async import resolve_many_async
+        return resolve_many_async(
+            self, base_type, *instance_args, **instance_kwargs)
 
     def resolve_many_lazy(self, base_types, *instance_args, **instance_kwargs):
         """
@@ -631,7 +3319,8 @@ class DIContainer(object):
         :rtype: type
         """
 
-        self.event_dispatcher.before_resolve_type(name=name)
+        if self._on_before_resolve_type is not None:
+            self._on_before_resolve_type(name=name)
 
         try:
             # try to resolve the configuration by name.
@@ -640,12 +3329,13 @@ class DIContainer(object):
             # if htere is a parent given, check if there is a configuration
             # for this name. otherwise raise an exception.
             if self.parent is not None:
-                return self.parent.resolve(name)
+                return self.parent.resolve_type(name)
             else:
                 raise MissingConfigurationError(name)
         type_ = self._resolve_type(conf.type, mixins=conf.mixins)
 
-        self.event_dispatcher.after_resolve_type(name=name, type=type_)
+        if self._on_after_resolve_type is not None:
+            self._on_after_resolve_type(name=name, type=type_)
 
         return type_
 
@@ -678,41 +3368,427 @@ class DIContainer(object):
         :returns: the buildup instance
         """
 
-        self.event_dispatcher.before_build_up(
-            name=name, instance=instance, overrides=overrides
-        )
-        conf = self.settings[name]
-        prop = conf.properties.copy()
-        prop.update(overrides)
+        if self._on_before_build_up is not None:
+            self._on_before_build_up(
+                name=name, instance=instance, overrides=overrides
+            )
+        try:
+            conf = self.settings[name]
+        except KeyError:
+            if self.parent is None:
+                raise
+            # a configuration of the parent created in this container.
+            conf = self.parent._find_conf(name)[2]
+        plan = self._plans.get(name)
+        if plan is not None and plan.conf is conf and not overrides:
+            plan.build_up(instance)
+        else:
+            prop = conf.properties.copy()
+            prop.update(overrides)
 
-        for key, value in prop.items():
-            setattr(instance, key, self._resolve_value(value))
+            for key, value in prop.items():
+                setattr(instance, key, self._resolve_value(value))
 
-        self.event_dispatcher.after_build_up(
-            name=name, instance=instance, overrides=overrides
-        )
+        if self._on_after_build_up is not None:
+            self._on_after_build_up(
+                name=name, instance=instance, overrides=overrides
+            )
 
         return instance
 
     def clear(self, name=None):
         """
-        Deletes all or the given singleton instances.
+        Deletes all or the given singleton instances and the idle
+        instances of the object pools.
 
         :param name: the name of the singleton instance that shoud be
                      destroied.
         :type name: str
         """
         if name is not None:
-            if name in self.singletons:
-                del self.singletons[name]
+            self.singletons.pop(name, None)
+            if name in self._pools:
+                self._pools[name].clear()
+        else:
+            self.singletons.clear()
+            for pool in list(self._pools.values()):
+                pool.clear()
+
+        if self._on_after_clear is not None:
+            self._on_after_clear(name=name)
+
+    def _get_scope(self, key):
+        try:
+            return self._scopes[key]
+        except KeyError:
+            pass
+        scope_class = self.__default_scope_classes.get(key)
+        if scope_class is None:
+            raise DIConfigurationError('Unknown scope "%s".' % key)
+        with self._locks_lock:
+            return self._scopes.setdefault(key, scope_class(self))
+
+    def _get_scope_store(self, name, conf):
+        """
+        Returns the store of the active scope of the configuration. If
+        the scope is not active in this container, the store of the
+        nearest parent container with an active scope is used.
+
+        :raises: DIConfigurationError if the scope is not active.
+        :rtype: collections.OrderedDict
+        """
+        store = self._get_scope(conf.scope).get_store()
+        container = self.parent
+        while store is None and container is not None:
+            # only scopes that were already used can be active.
+            scope = container._scopes.get(conf.scope)
+            if scope is not None:
+                store = scope.get_store()
+            container = container.parent
+        if store is None:
+            raise DIConfigurationError(
+                'Configuration "%s" is scoped to "%s", but there is no '
+                'active scope. Use `container.scope("%s")`.' % (
+                    name, conf.scope, conf.scope))
+        return store
+
+    def _dispose(self, store):
+        """
+        Calls the `dispose_method` of the instances in the given scope
+        store, in reverse order of their creation. Errors are logged.
+        """
+        for name, obj in reversed(list(store.items())):
+            conf = self.settings.get(name)
+            if conf is None and self.parent is not None:
+                # a configuration of a parent created in a child.
+                try:
+                    conf = self.parent._find_conf(name)[2]
+                except MissingConfigurationError:
+                    pass
+            method = getattr(conf, 'dispose_method', None)
+            if not method:
+                continue
+            try:
+                getattr(obj, method)()
+            except Exception:
+                _logger.exception('Could not dispose "%s".', name)
+        store.clear()
+
+    @contextlib.contextmanager
+    def scope(self, key='context'):
+        """
+        Starts a new scope. Configurations with this `scope` are created
+        once within the block and disposed - by calling their
+        `dispose_method` - when the block is left. Scopes can be nested.
+
+        Usage::
+
+            with container.scope():
+                session = container.resolve('session')
+                assert session is container.resolve('session')
+
+        :param key: the scope to start. `context` or `thread` or
+                    the key of a scope added with :meth:`add_scope`.
+        :type key: str
+
+        :returns: the store of the scope instances by name.
+        """
+        scope = self._get_scope(key)
+        token = scope.enter()
+        try:
+            yield scope.get_store()
+        finally:
+            self._dispose(scope.exit(token))
+
+    def get_pool(self, name):
+        """
+        Returns the object pool of the configuration `name`, which needs
+        the `pool` option. The pool is recreated if the configuration was
+        replaced.
+
+        :raises: DIConfigurationError
+        :rtype: di.DIObjectPool
+        """
+        name, conf = self._get_conf(name)
+        if not conf.pool:
+            raise DIConfigurationError(
+                'Configuration "%s" has no pool.' % name)
+        pool = self._pools.get(name)
+        if pool is None or pool.conf is not conf:
+            with self._locks_lock:
+                pool = self._pools.get(name)
+                if pool is None or pool.conf is not conf:
+                    pool = self._pools[name] = DIObjectPool(self, name, conf)
+        return pool
+
+    def acquire(self, name, timeout=None):
+        """
+        Takes an instance of a pooled configuration out of its pool. Hand
+        it back with :meth:`release`, or use :meth:`checkout`.
+
+        :param timeout: seconds to wait if all instances are checked out.
+        :type timeout: float
+
+        :raises: PoolExhaustedError
+        """
+        return self.get_pool(name).acquire(timeout)
+
+    def release(self, name, instance):
+        """
+        Returns an instance taken with :meth:`acquire` into its pool.
+        """
+        self.get_pool(name).release(instance)
+
+    @contextlib.contextmanager
+    def checkout(self, name, timeout=None):
+        """
+        Takes an instance of a pooled configuration out of its pool and
+        returns it at the end of the block. `resolve` always creates new
+        instances, even for pooled configurations.
+
+        Usage::
+
+            with container.checkout('parser') as parser:
+                parser.feed(data)
+
+        :param timeout: seconds to wait if all instances are checked out.
+        :type timeout: float
+
+        :raises: PoolExhaustedError
+        """
+        with self.get_pool(name).checkout(timeout) as instance:
+            yield instance
+
+    def _warmup_targets(self):
+        """
+        Returns the functions importing the python names used by the
+        configurations and the configuration names using them, both by
+        python name.
+
+        :rtype: tuple
+        """
+        targets = OrderedDict()
+        names = OrderedDict()
+
+        def add(name, target, func, *args):
+            targets.setdefault(target, functools.partial(func, *args))
+            names.setdefault(target, [])
+            if name not in names[target]:
+                names[target].append(name)
+
+        def reference(python_name):
+            return ReferenceResolver(python_name).resolve(self)
+
+        for name, conf in self.settings.items():
+            target = str(conf.type)
+            if conf.mixins:
+                target = '%s(%s)' % (
+                    target, ', '.join(str(mixin) for mixin in conf.mixins))
+            add(name, target, self._resolve_type, conf.type, conf.mixins)
+            if conf.assert_type:
+                add(name, str(conf.assert_type), self._resolve_type,
+                    conf.assert_type)
+
+            conf_args, conf_kwargs = self._split_args(conf.args, conf.kwargs)
+            values = list(conf_args) + list(conf_kwargs.values()) + \
+                list(conf.properties.values())
+            for value in values:
+                if isinstance(value, string_types) and ':' in value:
+                    key, value_conf = value.split(':', 1)
+                    resolver_class = self._value_resolver_classes.get(key)
+                elif isinstance(value, Resolver):
+                    resolver_class, value_conf = type(value), value.value_conf
+                else:
+                    continue
+                if resolver_class is None or \
+                        not isinstance(value_conf, string_types):
+                    continue
+                if issubclass(resolver_class, ModuleResolver):
+                    add(name, value_conf, self.import_module, value_conf)
+                elif issubclass(
+                        resolver_class, (ReferenceResolver, FactoryResolver)):
+                    add(name, value_conf, reference, value_conf)
+                elif issubclass(resolver_class, AttributeResolver):
+                    value_conf = value_conf.rsplit('.', 1)[0]
+                    add(name, value_conf, reference, value_conf)
+        return targets, names
+
+    def warmup(self, workers=None):
+        """
+        Imports every type, `assert_type` and mixin of the configurations
+        and every module referenced by `mod:`, `ref:`, `attr:` and
+        `factory:` values or resolver instances up front, so the first
+        resolve of a name does not pay for the imports. Factories are not
+        called. The resolved types are cached.
+
+        :param workers: import on a thread pool with this number of
+                        workers. sequentially if `None`.
+        :type workers: int
+
+        :raises: WarmupError with all failures.
+        """
+        targets, names = self._warmup_targets()
+        errors = OrderedDict()
+
+        if workers:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    (target, executor.submit(func))
+                    for target, func in targets.items()]
+                for target, future in futures:
+                    error = future.exception()
+                    if error is not None:
+                        errors[target] = error
         else:
-            self.singletons = {}
+            for target, func in targets.items():
+                try:
+                    func()
+                except Exception as error:
+                    errors[target] = error
+
+        if errors:
+            raise WarmupError(errors, dict(
+                (target, names[target]) for target in errors))
+        _logger.debug('imported %s python names.', len(targets))
+
+    def prefork(self, freeze=False):
+        """
+        Prepares the container for forking worker processes, i.e. in the
+        master of a pre-fork server. Creates the singletons of the
+        configurations with the `fork_safe` option, so the workers share
+        them copy-on-write, and calls :meth:`after_fork` in each forked
+        child process (python 3.7+).
+
+        :param freeze: call :func:`gc.freeze` afterwards (python 3.7+), so
+                       the garbage collection of the workers does not
+                       touch - and copy - the objects created so far.
+        :type freeze: bool
+        :returns: the names of the created singletons.
+        :rtype: list
+        """
+        names = [
+            name for name, conf in self.settings.items()
+            if conf.singleton and conf.fork_safe]
+        for name in names:
+            self.resolve(name)
+
+        _fork_containers.add(self)
+        if not _register_at_fork:
+            _logger.warning(
+                'os.register_at_fork is not available. call after_fork() '
+                'in each forked process.')
+
+        if freeze:
+            if hasattr(gc, 'freeze'):
+                gc.freeze()
+            else:
+                _logger.warning('gc.freeze is not available.')
+        _logger.debug('created %s fork safe singletons.', len(names))
+        return names
 
-        self.event_dispatcher.after_clear(name=name)
+    def after_fork(self):
+        """
+        Reinitializes the container in a forked child process. Drops the
+        singletons of the configurations without the `fork_safe` option,
+        so they are created again on their next resolve, the idle
+        instances of the object pools and the stores of the scopes, i.e.
+        the thread scope of the forking thread. Replaces the locks another
+        thread of the parent could have held while forking.
+
+        Called automatically for containers prepared by :meth:`prefork`.
+        """
+        self._locks_lock = threading.Lock()
+        self._singleton_locks = {}
+        self._singleton_lock_owners = {}
+        self._singleton_lock_waiting = {}
+        self._singleton_lock_held = {}
+        self._type_index_lock = threading.Lock()
+        self._type_cache._lock = threading.Lock()
+        self._async_pending = {}
+        # pooled and scoped instances are never fork safe. drop without
+        # disposing, they still belong to the parent.
+        self._pools = {}
+        self._scopes = {}
+
+        def keep(name):
+            conf = self.settings.get(name)
+            return conf is not None and conf.fork_safe
+
+        names = self.singletons._after_fork(keep)
+        _logger.debug('dropped %s singletons after fork.', len(names))
+        if self._on_after_clear is not None:
+            for name in names:
+                self._on_after_clear(name=name)
+
+    def dependency_graph(self):
+        """
+        Returns the graph of the relations between the configurations of
+        this container. Names configured in parent containers are not
+        reported as missing.
+
+        :rtype: di.DIDependencyGraph
+        """
+        return DIDependencyGraph(
+            self.settings, external=self._external_names())
+
+    def _external_names(self):
+        """
+        Returns the names and aliases configured in the parent containers.
+
+        :rtype: set
+        """
+        external = set()
+        parent = self.parent
+        while parent is not None:
+            external.update(parent.settings.keys())
+            external.update(getattr(parent.settings, 'aliases', ()))
+            parent = parent.parent
+        return external
+
+    def validate(self, roots=None):
+        """
+        Checks the configurations for cyclic relations and relations to
+        missing names without creating anything. If `roots` are given,
+        configurations that can not be reached from them are reported
+        too.
+
+        :param roots: names of configurations used directly.
+        :type roots: iterable
+
+        :raises: ValidationError
+        :rtype: di.DIDependencyGraph
+        """
+        graph = self.dependency_graph()
+        cycles = graph.cycles()
+        dangling = graph.dangling()
+        unreachable = graph.unreachable(roots) if roots is not None else []
+        if cycles or dangling or unreachable:
+            raise ValidationError(cycles, dangling, unreachable)
+        return graph
+
+    def clear_type_cache(self):
+        """
+        Drops all cached types and the resolve plans holding them. The
+        types will be imported again on their next resolution.
+        """
+        self._type_cache.clear()
+        self._plans.clear()
+        self._async_plans.clear()
+        with self._type_index_lock:
+            self._reset_type_index()
 
     def create_child_container(self, *args, **kwargs):
         """
-        Creates a child container with the given Configuration
+        Creates a child container with the given Configuration. Names
+        that are not configured in the child use the configurations of
+        this container. They are created in the child if they relate to
+        a name the child overrides, otherwise they are resolved by this
+        container and its singletons are shared. Creating a child only
+        costs its own configurations.
+        The child shares the type cache of this container unless
+        `type_cache_size` is given and gets its own event dispatcher of the
+        type of this container's one unless `event_dispatcher` is given.
 
         :returns: a new container instance on this type.
         :rtype: di.DIContainer
@@ -724,16 +3800,19 @@ class DIContainer(object):
     def context(self, settings):
         """
         Use this container in a contextual block an replace / extend the
-        the settings for this.
+        the settings for this. The settings only apply to the current
+        thread or asyncio task and can be nested.
 
         :param settings: Settings that will be used in this Context.
         :type settings: dict
         """
         if not isinstance(settings, DIConfigManager):
             settings = DIConfigManager(settings)
-        self.settings.apply_context(settings)
-        yield
-        self.settings.reset_context()
+        token = self.settings.apply_context(settings)
+        try:
+            yield
+        finally:
+            self.settings.reset_context(token)
 
     def __dir__(self):
         """
@@ -778,18 +3857,25 @@ class DIContainer(object):
                 raise error
 
     def _inject(self, resolve_method, force=False, **inject_kwargs):
+        inject_items = tuple(inject_kwargs.items())
+
         def wrapper(func):
 
+            # the names of the positional arguments are looked up once.
+            arg_names = _positional_arg_names(func)
+
             @functools.wraps(func)
             def inner(*args, **kwargs):
 
                 # if args are given we map the args to the kwargs to
                 # ensure wie set the right values.
                 if args:
-                    args_spec = inspect.getargspec(func)
-                    for i, arg_value in enumerate(args):
-                        kwargs[args_spec.args[i]] = arg_value
-                for key, name in inject_kwargs.items():
+                    if len(args) > len(arg_names):
+                        raise TypeError(
+                            '%s() takes %s positional arguments but %s were '
+                            'given' % (func.__name__, len(arg_names), len(args)))
+                    kwargs.update(zip(arg_names, args))
+                for key, name in inject_items:
                     if force or key not in kwargs:
                         kwargs[key] = resolve_method(name)
                 _logger.debug(
@@ -828,6 +3914,32 @@ class DIContainer(object):
         return self._inject(self.resolve_many, force, **inject_kwargs)
 
 
+# the hooks a dispatcher does not override are `None` and not called.
+for _attribute in _HOOK_ATTRIBUTES:
+    setattr(DIContainer, _attribute, None)
+del _attribute
+
+
+def _positional_arg_names(func):
+    """
+    Returns the names of the arguments of `func` that can be passed
+    positionally.
+
+    :rtype: tuple
+    """
+    try:
+        signature = inspect.signature
+    except AttributeError:  # 2.x
+        return tuple(inspect.getargspec(func).args)
+    kinds = (
+        inspect.Parameter.POSITIONAL_ONLY,
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+    )
+    return tuple(
+        name for name, parameter in signature(func).parameters.items()
+        if parameter.kind in kinds)
+
+
 class Resolver(object):
 
     __metaclass__ = ABCMeta
@@ -902,7 +4014,8 @@ class ReferenceResolver(Resolver):
 
 reference = ref = ReferenceResolver
 reference_lazy = ref_lazy = ReferenceResolverLazy = \
-    type(str('ReferenceResolverLazy'), (LazyResolverMixin, ReferenceResolver), {})
+    type(str('ReferenceResolverLazy'), (LazyResolverMixin, ReferenceResolver),
+         {'key': 'ref_lazy'})
 
 
 class RelationResolver(Resolver):
@@ -920,7 +4033,8 @@ class RelationResolver(Resolver):
 
 relation = rel = RelationResolver
 relation_lazy = rel_lazy = RelationResolverLazy = \
-    type(str('RelationResolverLazy'), (LazyResolverMixin, RelationResolver), {})
+    type(str('RelationResolverLazy'), (LazyResolverMixin, RelationResolver),
+         {'key': 'rel_lazy'})
 
 
 class ModuleResolver(Resolver):
@@ -938,7 +4052,8 @@ class ModuleResolver(Resolver):
 
 module = mod = ModuleResolver
 module_lazy = mod_lazy = ModuleResolverLazy = \
-    type(str('ModuleResolverLazy'), (LazyResolverMixin, ModuleResolver), {})
+    type(str('ModuleResolverLazy'), (LazyResolverMixin, ModuleResolver),
+         {'key': 'mod_lazy'})
 
 
 class FactoryResolver(Resolver):
@@ -958,7 +4073,8 @@ class FactoryResolver(Resolver):
 
 fac = factory = FactoryResolver
 fac_lazy = factory_lazy = FactoryResolverLazy = \
-    type(str('FactoryResolverLazy'), (LazyResolverMixin, FactoryResolver), {})
+    type(str('FactoryResolverLazy'), (LazyResolverMixin, FactoryResolver),
+         {'key': 'factory_lazy'})
 
 
 class AttributeResolver(Resolver):
@@ -978,7 +4094,8 @@ class AttributeResolver(Resolver):
 
 attr = attribute = AttributeResolver
 attr_lazy = attribute_lazy = AttributeResolverLazy = \
-    type(str('AttributeResolverLazy'), (LazyResolverMixin, AttributeResolver), {})
+    type(str('AttributeResolverLazy'), (LazyResolverMixin, AttributeResolver),
+         {'key': 'attr_lazy'})
 
 
 # Register resolvers to use 'key:'-Shortcuts
@@ -993,6 +4110,238 @@ DIContainer.add_value_resolver(ReferenceResolverLazy)
 DIContainer.add_value_resolver(ModuleResolverLazy)
 DIContainer.add_value_resolver(FactoryResolverLazy)
 
+DIContainer.add_scope(ThreadScope)
+DIContainer.add_scope(ContextScope)
+
+
+#: the resolvers inlined by `DIContainer.compile_settings`.
+_COMPILED_RESOLVERS = OrderedDict((
+    (resolver_class.key, resolver_class) for resolver_class in (
+        RelationResolver, ModuleResolver, ReferenceResolver,
+        FactoryResolver, AttributeResolver)))
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _is_identifier(name):
+    """
+    Returns whether `name` can be used as python name in the generated
+    source, which keywords like `from` can not.
+
+    :rtype: bool
+    """
+    return bool(_IDENTIFIER.match(name)) and not keyword.iskeyword(name)
+
+_LITERAL_TYPES = (bool, int, float, type(None)) + string_types + (
+    () if py3 else (long,))  # noqa
+
+
+class _NotCompilable(Exception):
+    """
+    Raised while generating the function of a configuration that has to
+    be resolved as usual.
+    """
+
+
+class _SettingsCompiler(object):
+    """
+    Generates the module source of :meth:`DIContainer.compile_settings`.
+    """
+
+    def __init__(self, resolver_classes):
+        self.resolver_classes = resolver_classes
+        # module aliases by module name.
+        self.imports = OrderedDict()
+
+    def compile(self, settings):
+        entries = []
+        functions = []
+        factories = []
+        for name, conf in settings.items():
+            if isinstance(conf, DIConfig):
+                conf = conf._asdict()
+            conf = dict(conf)
+            conf.pop('name', None)
+            # fails like the container for invalid configurations.
+            DIConfig(**conf)
+            entries.append('    (%r, %s),' % (name, self.config(name, conf)))
+            imports = OrderedDict(self.imports)
+            try:
+                source = self.functions(len(factories), conf)
+            except _NotCompilable as error:
+                _logger.debug('not compiling %s: %s', name, error)
+                self.imports = imports
+                continue
+            functions.append(source)
+            factories.append('    %r: (%s, _create_%s, _build_up_%s),' % (
+                name, self.type_name(conf['type']), len(factories),
+                len(factories)))
+
+        lines = [
+            '# coding: utf-8',
+            '# generated by di.DIContainer.compile_settings. do not edit.',
+            'from __future__ import unicode_literals',
+            '',
+            'from collections import OrderedDict',
+            '',
+        ]
+        lines.extend(
+            'import %s as %s' % (module, alias)
+            for module, alias in self.imports.items())
+        lines.extend(['', '', 'SETTINGS = OrderedDict(['])
+        lines.extend(entries)
+        lines.append('])')
+        for source in functions:
+            lines.extend(['', ''] + source)
+        lines.extend(['', '', 'FACTORIES = {'])
+        lines.extend(factories)
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    def config(self, name, conf):
+        """
+        Returns the literal of the configuration without default values.
+        """
+        items = []
+        for key, value in conf.items():
+            if value == default_config.get(key):
+                continue
+            if key in ('type', 'assert_type'):
+                value = self.type_path(name, value)
+            elif key == 'mixins':
+                value = [self.type_path(name, mixin) for mixin in value]
+            else:
+                value = self.literal(name, value)
+            items.append('%r: %r' % (key, value))
+        return '{%s}' % ', '.join(items)
+
+    def type_path(self, name, value):
+        if isinstance(value, type):
+            return '%s.%s' % (value.__module__, value.__name__)
+        return self.literal(name, value)
+
+    def literal(self, name, value):
+        """
+        Returns the value with resolver instances replaced by their
+        `key:` strings.
+
+        :raises: DIConfigurationError
+        """
+        if isinstance(value, Resolver) and \
+                isinstance(value.value_conf, string_types) and \
+                self.resolver_classes.get(value.key) is type(value):
+            return '%s:%s' % (value.key, value.value_conf)
+        if isinstance(value, _LITERAL_TYPES):
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.literal(name, item) for item in value)
+        if isinstance(value, dict):
+            return dict(
+                (key, self.literal(name, item)) for key, item in value.items())
+        raise DIConfigurationError(
+            'The value %r of configuration "%s" can not be compiled.' % (
+                value, name))
+
+    def module(self, module):
+        alias = self.imports.get(module)
+        if alias is None:
+            alias = self.imports[module] = '_m%s' % len(self.imports)
+        return alias
+
+    def reference(self, python_name):
+        """
+        Returns the expression for a python name, like
+        :class:`ReferenceResolver`.
+        """
+        if '.' not in python_name:
+            return self.module(python_name)
+        module, attribute = python_name.rsplit('.', 1)
+        if not _is_identifier(attribute):
+            raise _NotCompilable('invalid name %s' % python_name)
+        return '%s.%s' % (self.module(module), attribute)
+
+    def type_name(self, python_name):
+        if '.' not in python_name:
+            python_name = '%s.%s' % (
+                'builtins' if py3 else '__builtin__', python_name)
+        return self.reference(python_name)
+
+    def value(self, value):
+        """
+        Returns the expression for a args, kwargs or properties value.
+        """
+        if isinstance(value, Resolver):
+            if type(value) is not _COMPILED_RESOLVERS.get(value.key):
+                raise _NotCompilable('resolver %r' % value)
+            key, value_conf = value.key, value.value_conf
+        elif isinstance(value, string_types) and ':' in value:
+            key, value_conf = value.split(':', 1)
+            if key not in self.resolver_classes:
+                return repr(value)
+            if self.resolver_classes[key] is not \
+                    _COMPILED_RESOLVERS.get(key):
+                raise _NotCompilable('resolver %s' % key)
+        else:
+            return repr(value)
+
+        if key == RelationResolver.key:
+            return 'container.resolve(%r)' % value_conf
+        if key == ModuleResolver.key:
+            return self.module(value_conf)
+        if key == ReferenceResolver.key:
+            return self.reference(value_conf)
+        if key == FactoryResolver.key:
+            return '%s()' % self.reference(value_conf)
+        # attribute resolver
+        reference, attribute = value_conf.rsplit('.', 1)
+        if not _is_identifier(attribute):
+            raise _NotCompilable('invalid name %s' % value_conf)
+        return '%s.%s' % (self.reference(reference), attribute)
+
+    def functions(self, index, conf):
+        """
+        Returns the source lines of the create and build up functions.
+
+        :raises: _NotCompilable
+        """
+        type_name = conf['type']
+        if conf.get('mixins'):
+            raise _NotCompilable('mixins')
+        if not isinstance(type_name, string_types) or ':' in type_name:
+            raise _NotCompilable('type %r' % type_name)
+        factory = self.type_name(type_name)
+        if conf.get('factory_method'):
+            if not _is_identifier(conf['factory_method']):
+                raise _NotCompilable('factory method')
+            factory = '%s.%s' % (factory, conf['factory_method'])
+
+        conf_args, conf_kwargs = DIContainer._split_args(
+            conf.get('args', ()), conf.get('kwargs', {}))
+        arguments = [self.value(value) for value in conf_args]
+        # keywords like `from` can only be passed as dictionary.
+        keywords = []
+        for key, value in conf_kwargs.items():
+            if not _IDENTIFIER.match(key):
+                raise _NotCompilable('argument %s' % key)
+            if keyword.iskeyword(key):
+                keywords.append('%r: %s' % (key, self.value(value)))
+            else:
+                arguments.append('%s=%s' % (key, self.value(value)))
+        if keywords:
+            arguments.append('**{%s}' % ', '.join(keywords))
+
+        lines = ['def _create_%s(container):' % index]
+        lines.append('    return %s(%s)' % (factory, ', '.join(arguments)))
+        lines.extend(
+            ['', '', 'def _build_up_%s(container, instance):' % index])
+        properties = conf.get('properties') or {}
+        for key, value in properties.items():
+            lines.append('    setattr(instance, %r, %s)' % (
+                key, self.value(value)))
+        if not properties:
+            lines.append('    pass')
+        return lines
+
 
 _DEFAULT_CONTAINER = None
 
@@ -1038,6 +4387,11 @@ class InjectDecoratorBase(object):
 
     def __call__(self, func):
 
+        # the decorated function of the containers inject method. it is
+        # created once per container and recreated if another container
+        # is used (i.e. after `set_default_container`).
+        bound = [None, None]
+
         @functools.wraps(func)
         def inner_func(*a, **kw):
             if self._container is None:
@@ -1051,8 +4405,12 @@ class InjectDecoratorBase(object):
                     "Neither a special ('__container') nor a default container "
                     "(di.set_default_container) was specified."
                 )
-            inject_method = getattr(container, self.inject_method)
-            return inject_method(**self._inject_kwargs)(func)(*a, **kw)
+            bound_container, injected = bound
+            if bound_container is not container:
+                inject_method = getattr(container, self.inject_method)
+                injected = inject_method(**self._inject_kwargs)(func)
+                bound[:] = container, injected
+            return injected(*a, **kw)
 
         return inner_func
 
@@ -0,0 +1,255 @@
+# coding: utf-8
+"""
+asyncio support for the :class:`di.DIContainer`. The functions of this
+module are used by :meth:`di.DIContainer.resolve_async` and
+:meth:`di.DIContainer.resolve_many_async`.
+
+Requires python 3.5 or newer.
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import inspect
+import logging
+
+import di
+
+_logger = logging.getLogger(__name__)
+
+# the names of the singletons created by the current task and the tasks
+# it waits for. tasks copy the context, so the relations of a singleton
+# see it. without `contextvars` (< 3.7) the chain can not be followed.
+_creating = di._ContextLocal('di_async_creating', ()) \
+    if di.contextvars is not None else None
+
+
+def _get_loop():
+    try:
+        return asyncio.get_running_loop()
+    except AttributeError:  # < 3.7
+        return asyncio.get_event_loop()
+
+
+async def _await_value(value):
+    """
+    Awaits the given value if it is awaitable.
+    """
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def _compile_value(container, value_conf):
+    """
+    Returns a callable without arguments that returns an awaitable of
+    the resolved value. Relations are resolved with :func:`resolve_async`,
+    all other values with the containers resolvers.
+
+    :rtype: callable
+    """
+    relation_prefix = '%s:' % di.RelationResolver.key
+    if isinstance(value_conf, di.RelationResolver) and \
+            not isinstance(value_conf, di.LazyResolverMixin):
+        name = value_conf.value_conf
+        return lambda: resolve_async(container, name)
+    if isinstance(value_conf, di.string_types) and \
+            value_conf.startswith(relation_prefix):
+        name = value_conf[len(relation_prefix):]
+        return lambda: resolve_async(container, name)
+    resolve = container._compile_value(value_conf)
+    return lambda: _await_value(resolve())
+
+
+class AsyncResolvePlan(object):
+    """
+    The asynchronous counterpart of :class:`di.DIResolvePlan`. It wraps
+    the synchronous plan and holds awaitable callables for each argument
+    and property.
+    """
+
+    __slots__ = ('plan', 'args', 'kwargs', 'properties')
+
+    def __init__(self, container, plan):
+        conf = plan.conf
+        conf_args, conf_kwargs = container._split_args(conf.args, conf.kwargs)
+        self.plan = plan
+        self.args = tuple(
+            _compile_value(container, value_conf) for value_conf in conf_args)
+        self.kwargs = tuple(
+            (key, _compile_value(container, value_conf))
+            for key, value_conf in conf_kwargs.items())
+        self.properties = tuple(
+            (key, _compile_value(container, value_conf))
+            for key, value_conf in conf.properties.items())
+
+    async def __call__(self):
+        """
+        Creates a new instance. All arguments are resolved concurrently.
+        """
+        values = await asyncio.gather(
+            *[value() for value in self.args] +
+            [value() for _, value in self.kwargs])
+        count = len(self.args)
+        kwargs = dict(
+            (key, value) for (key, _), value
+            in zip(self.kwargs, values[count:]))
+        return await _await_value(self.plan.factory(*values[:count], **kwargs))
+
+    async def build_up(self, instance):
+        """
+        Sets the configured properties on the given instance. All
+        properties are resolved concurrently.
+        """
+        values = await asyncio.gather(
+            *[value() for _, value in self.properties])
+        for (key, _), value in zip(self.properties, values):
+            setattr(instance, key, value)
+        return instance
+
+
+def _get_plan(container, name, conf):
+    plan = container._async_plans.get(name)
+    if plan is None or plan.plan.conf is not conf:
+        plan = AsyncResolvePlan(container, container._get_plan(name, conf))
+        container._async_plans[name] = plan
+    return plan
+
+
+async def _create(container, name, conf, instance_args, instance_kwargs):
+    plan = _get_plan(container, name, conf)
+
+    if instance_args or instance_kwargs:
+        obj = await _await_value(
+            plan.plan.factory(*instance_args, **instance_kwargs))
+    else:
+        obj = await plan()
+
+    if container._on_before_build_up is not None:
+        container._on_before_build_up(name=name, instance=obj, overrides={})
+    obj = await plan.build_up(obj)
+    if container._on_after_build_up is not None:
+        container._on_after_build_up(name=name, instance=obj, overrides={})
+
+    # save instance to singleton container
+    if conf.singleton:
+        if conf.evictable:
+            container.singletons.add(name, obj, True)
+        else:
+            container.singletons[name] = obj
+
+    if container._on_after_resolve is not None:
+        container._on_after_resolve(name=name, instance=obj)
+
+    return obj
+
+
+async def resolve_async(container, name, *instance_args, **instance_kwargs):
+    """
+    Resolves an object by its name. See
+    :meth:`di.DIContainer.resolve_async`.
+    """
+    # names not configured here use the configuration of the parent.
+    inherited = None
+    if container.parent is not None and container._is_inherited(name):
+        inherited = container._get_inherited_conf(name)
+        if inherited is None:
+            return await resolve_async(
+                container.parent, name, *instance_args, **instance_kwargs)
+
+    if container._on_before_resolve is not None:
+        container._on_before_resolve(name=name)
+
+    try:
+        return await _resolve_async(
+            container, name, inherited, instance_args, instance_kwargs)
+    except Exception as error:
+        if container._on_after_resolve_error is not None:
+            container._on_after_resolve_error(name=name, error=error)
+        raise
+
+
+async def _resolve_async(
+        container, name, inherited, instance_args, instance_kwargs):
+    # if there is no string provided as name, di will try to
+    # resolve the first configured instance with the given type.
+    if not isinstance(name, di.string_types):
+        for key in container._all_names_for_type(name):
+            return await resolve_async(
+                container, key, *instance_args, **instance_kwargs)
+        raise di.MissingConfigurationError(str(name))
+
+    obj = container.singletons.get(name, di._MISSING)
+    if obj is not di._MISSING:
+        return container._singleton_hit(name, obj)
+
+    name, conf = inherited or container._get_conf(name)
+    obj = container.singletons.get(name, di._MISSING)
+    if obj is not di._MISSING:
+        return container._singleton_hit(name, obj)
+
+    if conf.scope is not None:
+        store = container._get_scope_store(name, conf)
+        obj = store.get(name, di._MISSING)
+        if obj is not di._MISSING:
+            return container._singleton_hit(name, obj)
+        obj = await _create(
+            container, name, conf, instance_args, instance_kwargs)
+        store[name] = obj
+        return obj
+
+    if not conf.singleton:
+        return await _create(
+            container, name, conf, instance_args, instance_kwargs)
+
+    # the singleton depends on itself. its future would never be done.
+    creating = _creating.get() if _creating is not None else ()
+    if name in creating:
+        raise di.CircularDependencyError(
+            creating[creating.index(name):] + (name,))
+
+    # another task is already creating this singleton. wait for it.
+    pending = container._async_pending.get(name)
+    if pending is not None:
+        _logger.debug('waiting for pending singleton %s.', name)
+        obj = await asyncio.shield(pending)
+        if container._on_after_resolve_singleton is not None:
+            container._on_after_resolve_singleton(name=name, instance=obj)
+        return obj
+
+    future = _get_loop().create_future()
+    container._async_pending[name] = future
+    token = _creating.set(creating + (name,)) \
+        if _creating is not None else None
+    try:
+        obj = await _create(
+            container, name, conf, instance_args, instance_kwargs)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as error:
+        future.set_exception(error)
+        # mark the exception as retrieved if there is no other waiter.
+        future.exception()
+        raise
+    else:
+        future.set_result(obj)
+    finally:
+        container._async_pending.pop(name, None)
+        if token is not None:
+            _creating.reset(token)
+    return obj
+
+
+async def resolve_many_async(
+        container, base_type, *instance_args, **instance_kwargs):
+    """
+    Resolves all instances which types is a subclass of `base_type`. See
+    :meth:`di.DIContainer.resolve_many_async`.
+    """
+    if isinstance(base_type, di.string_types):
+        base_type = container._resolve_type(base_type)
+    names = container._all_names_for_type(base_type)
+    return list(await asyncio.gather(*[
+        resolve_async(container, name, *instance_args, **instance_kwargs)
+        for name in names]))
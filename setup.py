@@ -11,6 +11,7 @@ from setuptools import setup
 py26 = sys.version_info < (2, 7)
 py27 = not py26 and sys.version_info < (3, 0)
 py3 = sys.version_info >= (3, 0)
+py35 = sys.version_info >= (3, 5)
 
 
 if py26:
@@ -21,6 +22,11 @@ else:
     install_requires = [
     ]
 
+if py35:
+    py_modules = ['di', 'di_async']
+else:
+    py_modules = ['di']
+
 
 setup_args = {
     'name': 'python-simple-di',
@@ -32,7 +38,7 @@ setup_args = {
     'maintainer': di.__maintainer__,
     'maintainer_email': di.__maintainer_email__,
     'url': di.__website__,
-    'py_modules': ['di'],
+    'py_modules': py_modules,
     'license': 'MIT',
     'install_requires': install_requires,
     'classifiers': [
@@ -1132,3 +1132,1762 @@ class TestArgsKwargsTestCase(unittest.TestCase):
         self.assertFalse(mock_type.called)
         container.resolve('demo')
         mock_type.assert_called_with(1, zwei=2, drei=3)
+
+
+class ResolvePlanTestCase(unittest.TestCase):
+
+    def test__plan_compiled_once(self):
+        """
+        Passes if the type is resolved only once for multiple resolves
+        and the relation is resolved on every call.
+        """
+        container = DIContainer({
+            'instance': {
+                'type': 'mock.Mock',
+                'kwargs': {'related': 'rel:related'},
+                'properties': {'prop': 'rel:related'},
+            },
+            'related': {'type': 'mock.Mock'},
+        })
+        with mock.patch.object(
+                container, '_resolve_type',
+                wraps=container._resolve_type) as resolve_type_mock:
+            first = container.resolve('instance')
+            second = container.resolve('instance')
+        self.assertEqual(resolve_type_mock.call_count, 2)
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.prop, second.prop)
+        self.assertIs(container._plans['instance'].conf,
+                      container.settings['instance'])
+
+    def test__plan_rebuilt_on_replace(self):
+        """
+        Passes if replacing a configuration drops its compiled plan.
+        """
+        container = DIContainer({
+            'instance': {'type': 'mock.Mock', 'properties': {'id': 1}},
+        })
+        self.assertEqual(container.resolve('instance').id, 1)
+        container.register(
+            'instance', {'type': 'mock.Mock', 'properties': {'id': 2}},
+            replace=True)
+        self.assertEqual(container.resolve('instance').id, 2)
+
+
+class TypeCacheTestCase(unittest.TestCase):
+
+    def test__mixin_type_is_stable(self):
+        """
+        Passes if instances of a configuration with mixins share
+        one computed type.
+        """
+        mixin_type = type(str("MixinType"), (object,), {})
+        container = DIContainer({'a': {
+            'type': 'collections.OrderedDict',
+            'mixins': [mixin_type],
+        }})
+        first = container.resolve('a')
+        container.register('a', {'type': 'collections.OrderedDict',
+                                  'mixins': [mixin_type]}, replace=True)
+        second = container.resolve('a')
+        self.assertIs(type(first), type(second))
+        self.assertIs(container.resolve_type('a'), type(first))
+
+    def test__bounded(self):
+        """
+        Passes if the least recently used type becomes dropped.
+        """
+        cache = di.DITypeCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test__mixin_type_is_not_dropped(self):
+        """
+        Passes if computed mixin types stay in a full cache, so existing
+        instances keep being instances of the resolved type.
+        """
+        mixin_type = type(str("MixinType"), (object,), {})
+        container = DIContainer(dict(
+            ('m%s' % i, {'type': type_name, 'mixins': [mixin_type]})
+            for i, type_name in enumerate((
+                'collections.OrderedDict', 'collections.Counter',
+                'collections.deque'))), type_cache_size=2)
+        instance = container.resolve('m0')
+        container.resolve_type('m1')
+        container.resolve_type('m2')
+        self.assertIsInstance(instance, container.resolve_type('m0'))
+
+        cache = di.DITypeCache(maxsize=1)
+        self.assertEqual(cache.set('a', 1, pinned=True), 1)
+        self.assertEqual(cache.set('a', 2, pinned=True), 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+
+    def test__clear_type_cache(self):
+        container = DIContainer({'a': {'type': 'mock.Mock'}})
+        container.resolve_type('a')
+        self.assertEqual(len(container._type_cache), 1)
+        container.clear_type_cache()
+        self.assertEqual(len(container._type_cache), 0)
+
+    def test__clear_type_cache_plans(self):
+        """
+        Passes if resolve uses the type imported after clearing the
+        cache, i.e. after a module reload.
+        """
+        container = DIContainer({'a': {'type': 'mock.Mock'}})
+        container.resolve('a')
+        new_type = type(str('Mock'), (object,), {})
+        with mock.patch('mock.Mock', new_type):
+            container.clear_type_cache()
+            self.assertIs(container.resolve_type('a'), new_type)
+            self.assertIsInstance(container.resolve('a'), new_type)
+
+
+class AliasIndexTestCase(unittest.TestCase):
+
+    def test__index(self):
+        """
+        Passes if the alias index follows construction, registration
+        and replacement.
+        """
+        container = DIContainer({
+            'a': {'type': 'mock.Mock', 'alias': ['alias_a']},
+        })
+        self.assertEqual(container.settings.aliases, {'alias_a': 'a'})
+
+        container.register('b', {'type': 'mock.Mock', 'alias': ['alias_b']})
+        self.assertEqual(container.settings.resolve_alias('alias_b'), 'b')
+
+        container.register(
+            'a', {'type': 'mock.Mock', 'alias': ['other_a']}, replace=True)
+        self.assertNotIn('alias_a', container.settings.aliases)
+        self.assertIsNotNone(container.resolve('other_a'))
+        self.assertRaises(
+            MissingConfigurationError, container.resolve, 'alias_a')
+
+    def test__collision(self):
+        """
+        Passes if an alias used by two configurations raises an error.
+        """
+        container = DIContainer({
+            'a': {'type': 'mock.Mock', 'alias': ['shared']},
+        })
+        self.assertRaises(
+            di.DIConfigurationError, container.register,
+            'b', {'type': 'mock.Mock', 'alias': ['shared']})
+        self.assertNotIn('b', container.settings)
+        self.assertEqual(container.settings.resolve_alias('shared'), 'a')
+        self.assertRaises(di.DIConfigurationError, DIConfigManager, {
+            'a': {'type': 'mock.Mock', 'alias': ['shared']},
+            'b': {'type': 'mock.Mock', 'alias': ['shared']},
+        })
+
+    def test__name_collision(self):
+        """
+        Passes if an alias equal to the name of another configuration
+        raises an error, in both orders.
+        """
+        container = DIContainer({
+            'a': {'type': 'mock.Mock', 'alias': ['alias_a']},
+        })
+        self.assertRaises(
+            di.DIConfigurationError, container.register,
+            'b', {'type': 'mock.Mock', 'alias': ['a']})
+        self.assertRaises(
+            di.DIConfigurationError, container.register,
+            'alias_a', {'type': 'mock.Mock'})
+        self.assertRaises(
+            di.DIConfigurationError, container.register_many,
+            {'b': {'type': 'mock.Mock', 'alias': ['c']},
+             'c': {'type': 'mock.Mock'}})
+        self.assertRaises(
+            di.DIConfigurationError, container.register_many,
+            {'alias_a': {'type': 'mock.Mock'}})
+        self.assertEqual(sorted(container.settings), ['a'])
+        self.assertRaises(di.DIConfigurationError, DIConfigManager, {
+            'a': {'type': 'mock.Mock'},
+            'b': {'type': 'mock.Mock', 'alias': ['a']},
+        })
+
+        container.register('b', {'type': 'mock.Mock', 'alias': ['b']})
+        self.assertEqual(container.settings.resolve_alias('b'), 'b')
+
+    def test__context_alias(self):
+        """
+        Passes if aliases of a context overlay can be resolved.
+        """
+        container = DIContainer({'a': {'type': 'mock.Mock'}})
+        with container.context({
+                'b': {'type': 'mock.Mock', 'alias': ['alias_b'],
+                      'properties': {'source': 'context'}}}):
+            self.assertEqual(container.resolve('alias_b').source, 'context')
+        self.assertRaises(
+            MissingConfigurationError, container.resolve, 'alias_b')
+
+
+class TypeIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        class Base(object):
+            pass
+
+        class One(Base):
+            pass
+
+        class Two(Base):
+            pass
+
+        self.Base, self.One, self.Two = Base, One, Two
+
+    def test__registration_order(self):
+        """
+        Passes if resolve by type returns the first registered subclass.
+        """
+        conf = OrderedDict()
+        conf['two'] = {'type': self.Two}
+        conf['one'] = {'type': self.One}
+        conf['other'] = {'type': 'mock.Mock'}
+        container = DIContainer(conf)
+        self.assertIsInstance(container.resolve(self.Base), self.Two)
+        self.assertEqual(
+            [type(i) for i in container.resolve_many(self.Base)],
+            [self.Two, self.One])
+
+    def test__register_updates_index(self):
+        """
+        Passes if registered and replaced configurations are indexed
+        without losing their position.
+        """
+        conf = OrderedDict()
+        conf['one'] = {'type': self.One}
+        conf['two'] = {'type': self.Two}
+        container = DIContainer(conf)
+        self.assertEqual(len(list(container.resolve_many(self.Base))), 2)
+
+        container.register('three', {'type': self.One})
+        container.register('one', {'type': 'mock.Mock'}, replace=True)
+        self.assertEqual(
+            container._names_for_type(self.Base), ('two', 'three'))
+
+        container.register('one', {'type': self.Two}, replace=True)
+        self.assertEqual(
+            container._names_for_type(self.Base), ('one', 'two', 'three'))
+
+
+class ThreadSafeSingletonTestCase(unittest.TestCase):
+
+    def test__created_once(self):
+        """
+        Passes if a slow singleton becomes created only once when
+        resolved by multiple threads at the same time.
+        """
+        import threading
+        import time
+
+        calls = []
+
+        class Slow(object):
+            def __init__(self):
+                calls.append(self)
+                time.sleep(0.05)
+
+        container = DIContainer({'slow': {'type': Slow, 'singleton': True}})
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(container.resolve('slow')))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        for result in results:
+            self.assertIs(result, calls[0])
+
+    def test__circular_dependency(self):
+        """
+        Passes if singletons depending on each other raise an error.
+        """
+        container = DIContainer({
+            'a': {'type': 'mock.Mock', 'singleton': True,
+                  'properties': {'b': 'rel:b'}},
+            'b': {'type': 'mock.Mock', 'singleton': True,
+                  'properties': {'a': 'rel:a'}},
+        })
+        with self.assertRaises(di.CircularDependencyError) as context:
+            container.resolve('a')
+        self.assertEqual(context.exception.names, ('a', 'b', 'a'))
+        self.assertIn('a -> b -> a', str(context.exception))
+        self.assertNotIn('a', container.singletons)
+        self.assertEqual(container._singleton_lock_owners, {})
+        self.assertEqual(container._singleton_lock_held, {})
+
+
+class ParallelInitializationTestCase(unittest.TestCase):
+
+    def test__dependency_order(self):
+        """
+        Passes if all non-lazy configurations are created and each after
+        the ones it relates to.
+        """
+        created = []
+
+        def factory(name):
+            def create(**kwargs):
+                created.append(name)
+                return mock.Mock(name=name)
+            return create
+
+        container = DIContainer({
+            'a': {'type': factory('a'), 'lazy': False, 'singleton': True,
+                  'kwargs': {'b': 'rel:b', 'c': RelationResolver('alias_c')}},
+            'b': {'type': factory('b'), 'lazy': False, 'singleton': True},
+            'c': {'type': factory('c'), 'lazy': False, 'singleton': True,
+                  'alias': ['alias_c']},
+            'd': {'type': factory('d'), 'singleton': True},
+        }, eager_workers=4)
+
+        self.assertEqual(sorted(created), ['a', 'b', 'c'])
+        self.assertEqual(created[-1], 'a')
+        self.assertEqual(
+            sorted(container.singletons.keys()), ['a', 'b', 'c'])
+
+    def test__errors_collected(self):
+        """
+        Passes if all failures are raised together and dependents of a
+        failed configuration are skipped.
+        """
+        def fail():
+            raise ValueError('fail')
+
+        with self.assertRaises(di.InitializationError) as context:
+            DIContainer({
+                'a': {'type': fail, 'lazy': False},
+                'b': {'type': fail, 'lazy': False},
+                'c': {'type': 'mock.Mock', 'lazy': False,
+                      'properties': {'a': 'rel:a'}},
+                'd': {'type': 'mock.Mock', 'lazy': False},
+            }, eager_workers=2)
+
+        self.assertEqual(sorted(context.exception.errors), ['a', 'b'])
+        self.assertEqual(context.exception.skipped, ('c',))
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'requires python 3.5')
+class ResolveAsyncTestCase(unittest.TestCase):
+
+    def run_async(self, factory):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(factory())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def test__async_factory(self):
+        """
+        Passes if coroutine factories are awaited for the instance and
+        for its related arguments and properties.
+        """
+        import asyncio
+
+        def create_pool(size):
+            return asyncio.sleep(0, result={'size': size})
+
+        container = DIContainer({
+            'pool': {'type': create_pool, 'kwargs': {'size': 3},
+                     'singleton': True},
+            'service': {'type': 'mock.Mock',
+                        'kwargs': {'pool': 'rel:pool'},
+                        'properties': {'other_pool': rel('pool')}},
+        })
+
+        service = self.run_async(lambda: container.resolve_async('service'))
+        self.assertEqual(service.other_pool, {'size': 3})
+        self.assertIs(service.other_pool, container.singletons['pool'])
+        self.assertIs(
+            service.pool,
+            self.run_async(lambda: container.resolve_async('pool')))
+
+    def test__singleton_coalesced(self):
+        """
+        Passes if concurrent resolutions of a singleton share one
+        creation.
+        """
+        import asyncio
+
+        calls = []
+
+        def create():
+            calls.append(1)
+            return asyncio.sleep(0.01, result=mock.Mock())
+
+        container = DIContainer({
+            'singleton': {'type': create, 'singleton': True},
+        })
+
+        async_results = self.run_async(lambda: asyncio.gather(*[
+            container.resolve_async('singleton') for _ in range(3)]))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(map(id, async_results))), 1)
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'requires contextvars')
+    def test__circular_dependency(self):
+        """
+        Passes if a singleton that depends on itself raises an error
+        instead of waiting for its own creation.
+        """
+        import asyncio
+
+        container = DIContainer({
+            'a': {'type': 'mock.Mock', 'singleton': True,
+                  'kwargs': {'b': 'rel:b'}},
+            'b': {'type': 'mock.Mock', 'singleton': True,
+                  'kwargs': {'a': 'rel:a'}},
+        })
+        with self.assertRaises(di.CircularDependencyError) as context:
+            self.run_async(lambda: asyncio.wait_for(
+                container.resolve_async('a'), timeout=5))
+        self.assertEqual(context.exception.names, ('a', 'b', 'a'))
+        self.assertEqual(container._async_pending, {})
+
+    def test__resolve_many_async(self):
+        class Base(object):
+            pass
+
+        conf = OrderedDict()
+        conf['one'] = {'type': type(str('One'), (Base,), {})}
+        conf['two'] = {'type': 'mock.Mock'}
+        conf['three'] = {'type': type(str('Three'), (Base,), {})}
+        container = DIContainer(conf)
+        result = self.run_async(lambda: container.resolve_many_async(Base))
+        self.assertEqual(
+            [type(i).__name__ for i in result], ['One', 'Three'])
+
+
+class EventHookBindingTestCase(unittest.TestCase):
+
+    def test__default_dispatcher_not_called(self):
+        """
+        Passes if no hook of the default dispatcher becomes bound.
+        """
+        container = DIContainer({'a': {'type': 'mock.Mock'}})
+        for hook in di.DIEventDispatcher.hooks:
+            self.assertIsNone(getattr(container, '_on_%s' % hook))
+
+    def test__overridden_hooks(self):
+        """
+        Passes if only the overridden hooks are bound and called.
+        """
+        resolved = []
+
+        class Dispatcher(di.DIEventDispatcher):
+            def after_resolve(self, name, instance, *args, **kwargs):
+                resolved.append(name)
+
+        container = DIContainer(
+            {'a': {'type': 'mock.Mock'}}, event_dispatcher=Dispatcher)
+        self.assertIsNone(container._on_before_resolve)
+        container.resolve('a')
+        self.assertEqual(resolved, ['a'])
+
+    def test__singleton_hit(self):
+        """
+        Passes if the hooks are called for existing singletons, too.
+        """
+        calls = []
+
+        class Dispatcher(di.DIEventDispatcher):
+            def before_resolve(self, name, *args, **kwargs):
+                calls.append(('before', name))
+
+            def after_resolve_singleton(self, name, instance, *args,
+                                        **kwargs):
+                calls.append(('singleton', name))
+
+        container = DIContainer(
+            {'a': {'type': 'mock.Mock', 'singleton': True}},
+            event_dispatcher=Dispatcher)
+        container.resolve('a')
+        del calls[:]
+        container.resolve('a')
+        self.assertEqual(calls, [('before', 'a'), ('singleton', 'a')])
+
+    def test__composite_dispatcher(self):
+        """
+        Passes if all dispatchers of a list are called.
+        """
+        calls = []
+
+        class First(di.DIEventDispatcher):
+            def after_resolve(self, name, instance, *args, **kwargs):
+                calls.append(('first', name))
+
+        class Second(di.DIEventDispatcher):
+            def after_resolve(self, name, instance, *args, **kwargs):
+                calls.append(('second', name))
+
+            def after_register(self, name, settings, *args, **kwargs):
+                calls.append(('register', name))
+
+        container = DIContainer(
+            {'a': {'type': 'mock.Mock'}}, event_dispatcher=[First, Second])
+        self.assertIsInstance(
+            container.event_dispatcher, di.DICompositeEventDispatcher)
+        container.resolve('a')
+        container.register('b', {'type': 'mock.Mock'})
+        self.assertEqual(
+            calls, [('first', 'a'), ('second', 'a'), ('register', 'b')])
+        self.assertIsNone(container._on_before_resolve)
+
+    def test__set_dispatcher(self):
+        """
+        Passes if assigning a dispatcher rebinds the hooks.
+        """
+        container = DIContainer({'a': {'type': 'mock.Mock'}})
+        container.event_dispatcher = mock.MagicMock()
+        container.resolve('a')
+        self.assertTrue(container.event_dispatcher.after_resolve.called)
+
+
+class ValueResolverDispatchTestCase(unittest.TestCase):
+
+    def test__parsed_once(self):
+        """
+        Passes if string values are parsed into resolver instances when
+        the plan is compiled and plain strings are kept.
+        """
+        container = DIContainer({
+            'a': {'type': 'mock.Mock',
+                  'kwargs': {'b': 'rel:b', 'url': 'http://example.org',
+                             'path': 'c:\\temp'}},
+            'b': {'type': 'mock.Mock'},
+        })
+        with mock.patch.object(
+                RelationResolver, '__init__', autospec=True,
+                side_effect=RelationResolver.__init__) as init_mock:
+            first = container.resolve('a')
+            second = container.resolve('a')
+        self.assertEqual(init_mock.call_count, 1)
+        self.assertIsNot(first.b, second.b)
+        self.assertEqual(first.url, 'http://example.org')
+        self.assertEqual(first.path, 'c:\\temp')
+
+    def test__lazy_shortcut(self):
+        """
+        Passes if the `*_lazy` shortcuts are available as string prefix.
+        """
+        container = DIContainer({
+            'a': {'type': dict, 'kwargs': {'b': 'rel_lazy:b'}},
+            'b': {'type': str, 'args': ['value']},
+        })
+        self.assertIn('rel_lazy', container.value_resolvers)
+        result = container.resolve('a')
+        self.assertIsInstance(result['b'], container.get_proxy_type())
+        self.assertEqual(result['b'], 'value')
+        self.assertEqual(container._resolve_value('mod_lazy:sys'), sys)
+
+
+class InjectBindingTestCase(unittest.TestCase):
+
+    def test__signature_inspected_once(self):
+        """
+        Passes if the signature is only inspected on decoration.
+        """
+        container = DIContainer({'service': {'type': 'mock.Mock'}})
+
+        with mock.patch.object(
+                di, '_positional_arg_names',
+                wraps=di._positional_arg_names) as arg_names_mock:
+            @container.inject(service='service')
+            def view(request, service):
+                return request, service
+
+            for _ in range(3):
+                request, service = view('request')
+                self.assertEqual(request, 'request')
+                self.assertIsInstance(service, mock.Mock)
+
+        self.assertEqual(arg_names_mock.call_count, 1)
+
+    def test__too_many_arguments(self):
+        container = DIContainer({'service': {'type': 'mock.Mock'}})
+
+        @container.inject(service='service')
+        def view(request, service=None):
+            return request
+
+        self.assertRaises(TypeError, view, 1, 2, 3)
+
+
+class InjectDecoratorBindingTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        di.set_default_container(None)
+
+    def test__bound_once_per_container(self):
+        """
+        Passes if the containers inject method is called once per
+        container and again after the default container changed.
+        """
+        first = DIContainer({'service': {'type': 'mock.Mock',
+                                         'properties': {'source': 'first'}}})
+        second = DIContainer({'service': {'type': 'mock.Mock',
+                                          'properties': {'source': 'second'}}})
+
+        @di.inject(service='service')
+        def view(service):
+            return service.source
+
+        di.set_default_container(first)
+        with mock.patch.object(first, 'inject', wraps=first.inject) as m:
+            self.assertEqual(view(), 'first')
+            self.assertEqual(view(), 'first')
+        self.assertEqual(m.call_count, 1)
+
+        di.set_default_container(second)
+        self.assertEqual(view(), 'second')
+
+
+class DependencyGraphTestCase(unittest.TestCase):
+
+    def test__edges(self):
+        """
+        Passes if relations in args, kwargs and properties become edges,
+        aliases are resolved and lazy relations are marked.
+        """
+        container = DIContainer(OrderedDict((
+            ('db', {'type': 'mock.Mock', 'lazy': True, 'alias': ['database']}),
+            ('cache', {'type': 'mock.Mock', 'lazy': True}),
+            ('service', {
+                'type': 'mock.Mock', 'lazy': True,
+                'args': ['rel:database'],
+                'kwargs': {'cache': di.RelationResolverLazy('cache')},
+                'properties': {'other': 'rel_lazy:db'},
+            }),
+        )))
+        graph = container.dependency_graph()
+        self.assertEqual(graph.dependencies('service'), ['db'])
+        self.assertEqual(
+            graph.dependencies('service', lazy=True), ['db', 'cache'])
+        self.assertEqual(
+            graph.edges['service'][0],
+            di.DIDependency('service', 'db', False, 'args[0]'))
+        self.assertEqual(graph.topological_order(), ['db', 'cache', 'service'])
+        self.assertEqual(graph.dangling(), [])
+
+    def test__cycles(self):
+        """
+        Passes if non-lazy cycles are found and lazy ones are ignored.
+        """
+        container = DIContainer(OrderedDict((
+            ('a', {'type': 'mock.Mock', 'lazy': True, 'args': ['rel:b']}),
+            ('b', {'type': 'mock.Mock', 'lazy': True, 'args': ['rel:a']}),
+            ('c', {'type': 'mock.Mock', 'lazy': True, 'args': ['rel:c']}),
+            ('d', {'type': 'mock.Mock', 'lazy': True,
+                   'args': ['rel_lazy:d']}),
+        )))
+        graph = container.dependency_graph()
+        self.assertEqual(
+            sorted(sorted(cycle) for cycle in graph.cycles()),
+            [['a', 'b'], ['c']])
+        self.assertRaises(di.CircularDependencyError, graph.topological_order)
+        self.assertRaises(di.ValidationError, container.validate)
+
+    def test__dangling_and_unreachable(self):
+        """
+        Passes if missing names are reported unless a parent container
+        knows them, and unreachable names are reported for given roots.
+        """
+        parent = DIContainer({'config': {'type': 'mock.Mock', 'lazy': True}})
+        container = DIContainer(OrderedDict((
+            ('service', {'type': 'mock.Mock', 'lazy': True,
+                         'kwargs': {'config': 'rel:config',
+                                    'db': 'rel:missing'}}),
+            ('unused', {'type': 'mock.Mock', 'lazy': True}),
+        )), parent=parent)
+
+        with self.assertRaises(di.ValidationError) as context:
+            container.validate(roots=['service'])
+        error = context.exception
+        self.assertEqual(
+            [(d.source, d.target) for d in error.dangling],
+            [('service', 'missing')])
+        self.assertEqual(error.unreachable, ['unused'])
+        self.assertEqual(error.cycles, [])
+
+    def test__validate_on_init(self):
+        """
+        Passes if the validate option fails before anything is created.
+        """
+        with mock.patch('mock.Mock') as mock_type:
+            self.assertRaises(
+                di.ValidationError, DIContainer,
+                {'a': {'type': 'mock.Mock', 'args': ['rel:missing']}},
+                validate=True)
+        self.assertFalse(mock_type.called)
+
+    def test__export(self):
+        """
+        Passes if the graph exports as dot and json.
+        """
+        import json
+        container = DIContainer(OrderedDict((
+            ('db', {'type': 'mock.Mock', 'lazy': True}),
+            ('service', {'type': 'mock.Mock', 'lazy': True,
+                         'properties': {'db': 'rel_lazy:db'}}),
+        )))
+        graph = container.dependency_graph()
+        self.assertIn(
+            '"service" -> "db" [label="properties.db", style=dashed];',
+            graph.to_dot())
+        data = json.loads(graph.to_json())
+        self.assertEqual(data['order'], ['db', 'service'])
+        self.assertEqual(data['edges'][0]['target'], 'db')
+        self.assertTrue(data['edges'][0]['lazy'])
+
+
+class ProfilingEventDispatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.container = DIContainer(OrderedDict((
+            ('db', {'type': 'mock.Mock', 'singleton': True, 'lazy': True}),
+            ('service', {'type': 'mock.Mock', 'lazy': True,
+                         'alias': ['the_service'],
+                         'kwargs': {'db': 'rel:db'}}),
+            ('broken', {'type': 'mock.Mock', 'lazy': True,
+                        'args': ['rel:missing']}),
+        )), event_dispatcher=di.DIProfilingEventDispatcher)
+        self.profiler = self.container.event_dispatcher
+
+    def test__counts_and_depth(self):
+        """
+        Passes if creations, singleton hits and the nesting depth are
+        recorded under the configured name.
+        """
+        self.container.resolve('the_service')
+        self.container.resolve('service')
+        stats = self.profiler.snapshot()
+
+        self.assertEqual(stats['service']['count'], 2)
+        self.assertEqual(stats['service']['max_depth'], 0)
+        self.assertEqual(stats['db']['count'], 1)
+        self.assertEqual(stats['db']['singleton_hits'], 1)
+        self.assertEqual(stats['db']['hit_ratio'], 0.5)
+        self.assertEqual(stats['db']['max_depth'], 1)
+        self.assertEqual(
+            sum(stats['service']['total']['buckets'].values()), 2)
+
+    def test__self_time(self):
+        """
+        Passes if the time of related configurations is not part of the
+        self time.
+        """
+        self.container.resolve('service')
+        stats = self.profiler.snapshot()['service']
+        self.assertLessEqual(stats['self']['sum'], stats['total']['sum'])
+        self.assertGreaterEqual(
+            stats['total']['sum'],
+            self.profiler.snapshot()['db']['total']['sum'])
+
+    def test__errors(self):
+        """
+        Passes if failing resolves are counted and do not break the
+        nesting of later resolves.
+        """
+        self.assertRaises(
+            MissingConfigurationError, self.container.resolve, 'broken')
+        self.container.resolve('db')
+        stats = self.profiler.snapshot(reset=True)
+        self.assertEqual(stats['broken']['errors'], 1)
+        self.assertEqual(stats['missing']['errors'], 1)
+        self.assertEqual(stats['db']['max_depth'], 0)
+        self.assertEqual(self.profiler.snapshot(), {})
+
+    def test__resolve_by_type(self):
+        """
+        Passes if resolving by type records the resolved name.
+        """
+        self.container.resolve(mock.Mock)
+        self.assertEqual(list(self.profiler.snapshot()), ['db'])
+
+
+class ScopeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.container = DIContainer({
+            'session': {'type': 'mock.Mock', 'scope': 'context',
+                        'dispose_method': 'close'},
+            'worker': {'type': 'mock.Mock', 'scope': 'thread'},
+            'uow': {'type': 'mock.Mock', 'scope': 'context',
+                    'kwargs': {'session': 'rel:session'}},
+        })
+
+    def test__context_scope(self):
+        """
+        Passes if a scoped instance is created once per scope and
+        disposed when the scope is left.
+        """
+        with self.container.scope() as store:
+            session = self.container.resolve('session')
+            self.assertIs(self.container.resolve('uow').session, session)
+            self.assertIs(self.container.resolve('session'), session)
+            self.assertIs(store['session'], session)
+            self.assertFalse(session.close.called)
+        session.close.assert_called_once_with()
+
+        with self.container.scope():
+            self.assertIsNot(self.container.resolve('session'), session)
+
+    def test__nested_scopes(self):
+        """
+        Passes if a nested scope has its own instances and the outer
+        ones are restored afterwards.
+        """
+        with self.container.scope():
+            outer = self.container.resolve('session')
+            with self.container.scope():
+                inner = self.container.resolve('session')
+                self.assertIsNot(inner, outer)
+            self.assertTrue(inner.close.called)
+            self.assertIs(self.container.resolve('session'), outer)
+
+    def test__no_active_scope(self):
+        """
+        Passes if a context scoped configuration can not be resolved
+        outside of a scope.
+        """
+        self.assertRaises(
+            di.DIConfigurationError, self.container.resolve, 'session')
+
+    def test__thread_scope(self):
+        """
+        Passes if thread scoped instances are shared within a thread
+        only.
+        """
+        import threading
+        worker = self.container.resolve('worker')
+        self.assertIs(self.container.resolve('worker'), worker)
+
+        other = []
+        thread = threading.Thread(
+            target=lambda: other.append(self.container.resolve('worker')))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], worker)
+
+        with self.container.scope('thread'):
+            self.assertIsNot(self.container.resolve('worker'), worker)
+        self.assertIs(self.container.resolve('worker'), worker)
+
+    def test__invalid_config(self):
+        """
+        Passes if singleton and scope can not be combined and unknown
+        scopes raise on resolve.
+        """
+        self.assertRaises(
+            ValueError, DIConfig,
+            type='mock.Mock', singleton=True, scope='thread')
+        container = DIContainer({'a': {'type': 'mock.Mock', 'scope': 'x'}})
+        self.assertRaises(di.DIConfigurationError, container.resolve, 'a')
+        self.assertRaises(
+            di.DIConfigurationError, container.scope('x').__enter__)
+
+
+class ObjectPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.container = DIContainer({
+            'parser': {'type': 'mock.Mock', 'alias': ['the_parser'],
+                       'dispose_method': 'close',
+                       'pool': {'max_size': 2, 'min_size': 1,
+                                'idle_timeout': 10,
+                                'reset': {'buffer': None}}},
+            'plain': {'type': 'mock.Mock'},
+        })
+
+    def test__checkout_reuses_instances(self):
+        """
+        Passes if a released instance is reset and checked out again.
+        """
+        with self.container.checkout('parser') as parser:
+            parser.buffer = 'data'
+        with self.container.checkout('the_parser') as again:
+            self.assertIs(again, parser)
+            self.assertIsNone(again.buffer)
+        self.assertEqual(self.container.get_pool('parser').size, 1)
+
+    def test__resolve_creates_new_instances(self):
+        with self.container.checkout('parser') as parser:
+            pass
+        self.assertIsNot(self.container.resolve('parser'), parser)
+
+    def test__exhausted(self):
+        """
+        Passes if acquiring more than max_size instances times out.
+        """
+        first = self.container.acquire('parser')
+        second = self.container.acquire('parser')
+        self.assertIsNot(first, second)
+        self.assertRaises(
+            di.PoolExhaustedError, self.container.acquire, 'parser', 0.01)
+        self.container.release('parser', first)
+        self.assertIs(self.container.acquire('parser', 0.01), first)
+
+    def test__idle_eviction(self):
+        """
+        Passes if idle instances are evicted and disposed down to
+        min_size.
+        """
+        first = self.container.acquire('parser')
+        second = self.container.acquire('parser')
+        self.container.release('parser', first)
+        self.container.release('parser', second)
+
+        with mock.patch('di._timer', return_value=di._timer() + 60):
+            self.assertIs(self.container.acquire('parser'), second)
+        first.close.assert_called_once_with()
+        self.assertEqual(self.container.get_pool('parser').size, 1)
+
+    def test__clear(self):
+        with self.container.checkout('parser') as parser:
+            pass
+        self.container.clear('parser')
+        parser.close.assert_called_once_with()
+        self.assertEqual(self.container.get_pool('parser').size, 0)
+
+    def test__invalid(self):
+        self.assertRaises(
+            di.DIConfigurationError, self.container.get_pool, 'plain')
+        self.assertRaises(
+            ValueError, DIConfig, type='mock.Mock', pool=True, singleton=True)
+
+
+class ContextIsolationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.container = DIContainer({
+            'tenant': {'type': 'mock.Mock', 'properties': {'name': 'base'}},
+        })
+
+    def override(self, name):
+        return {'tenant': {'type': 'mock.Mock', 'properties': {'name': name}}}
+
+    def test__nested(self):
+        """
+        Passes if nested contexts stack and are removed in order.
+        """
+        with self.container.context(self.override('outer')):
+            with self.container.context({'other': {'type': 'mock.Mock'}}):
+                self.assertEqual(
+                    self.container.resolve('tenant').name, 'outer')
+                self.container.resolve('other')
+            with self.container.context(self.override('inner')):
+                self.assertEqual(
+                    self.container.resolve('tenant').name, 'inner')
+            self.assertEqual(self.container.resolve('tenant').name, 'outer')
+        self.assertEqual(self.container.resolve('tenant').name, 'base')
+
+    def test__reset_on_error(self):
+        """
+        Passes if the context is removed if the block raises.
+        """
+        with self.assertRaises(ValueError):
+            with self.container.context(self.override('error')):
+                raise ValueError()
+        self.assertIsNone(self.container.settings.context_settings)
+        self.assertEqual(self.container.resolve('tenant').name, 'base')
+
+    def test__threads(self):
+        """
+        Passes if a context does not apply to other threads.
+        """
+        import threading
+        names = []
+        with self.container.context(self.override('main')):
+            thread = threading.Thread(target=lambda: names.append(
+                self.container.resolve('tenant').name))
+            thread.start()
+            thread.join()
+            self.assertEqual(self.container.resolve('tenant').name, 'main')
+        self.assertEqual(names, ['base'])
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'requires contextvars')
+    def test__tasks(self):
+        """
+        Passes if concurrent asyncio tasks use their own contexts.
+        """
+        import asyncio
+        loop = asyncio.new_event_loop()
+
+        def start(name):
+            # the task copies the context of the block on creation.
+            with self.container.context(self.override(name)):
+                return loop.create_task(
+                    self.container.resolve_async('tenant'))
+
+        try:
+            tasks = [start('a'), start('b')]
+            self.assertIsNone(self.container.settings.context_settings)
+            results = loop.run_until_complete(asyncio.gather(*tasks))
+        finally:
+            loop.close()
+        self.assertEqual([result.name for result in results], ['a', 'b'])
+
+
+class CompileSettingsTestCase(unittest.TestCase):
+
+    settings = OrderedDict((
+        ('config', {'type': 'collections.OrderedDict', 'singleton': True,
+                    'alias': ['the_config']}),
+        ('service', {'type': 'mock.Mock',
+                     'kwargs': {'config': RelationResolver('the_config'),
+                                'module': 'mod:os'},
+                     'properties': {'sep': 'attr:os.path.sep',
+                                    'name': 'service'}}),
+        ('lazy', {'type': 'mock.Mock',
+                  'properties': {'config': 'rel_lazy:config'}}),
+        ('keywords', {'type': 'mock.Mock',
+                      'kwargs': {'from': 'rel:config', 'name': 'keywords'}}),
+        ('reserved', {'type': 'mock.Mock',
+                      'properties': {'attribute': 'ref:os.pass'}}),
+    ))
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.module_name = 'di_compiled_%s' % uuid4().hex
+        with open(os.path.join(self.path, '%s.py' % self.module_name),
+                  'w') as module:
+            module.write(DIContainer.compile_settings(self.settings))
+        sys.path.insert(0, self.path)
+
+    def tearDown(self):
+        sys.path.remove(self.path)
+        sys.modules.pop(self.module_name, None)
+
+    def test__compiled_plans(self):
+        """
+        Passes if the generated functions create the instances.
+        """
+        container = DIContainer(None, compiled=self.module_name)
+        service = container.resolve('service')
+        self.assertIsInstance(
+            container._plans['service'], di.DICompiledResolvePlan)
+        self.assertIs(service.config, container.resolve('config'))
+        self.assertIs(service.module, os)
+        self.assertEqual(service.sep, os.path.sep)
+        self.assertEqual(service.name, 'service')
+
+    def test__not_compiled(self):
+        """
+        Passes if configurations with lazy resolvers or changed
+        configurations are resolved as usual.
+        """
+        container = DIContainer(None, compiled=self.module_name)
+        container.register(
+            'service', {'type': 'mock.Mock'}, replace=True)
+        container.resolve('service')
+        container.resolve('lazy')
+        self.assertNotIsInstance(
+            container._plans['service'], di.DICompiledResolvePlan)
+        self.assertNotIsInstance(
+            container._plans['lazy'], di.DICompiledResolvePlan)
+
+    def test__keywords(self):
+        """
+        Passes if python keywords as argument names are passed and as
+        attribute names fall back to the usual resolve.
+        """
+        compiled = __import__(self.module_name)
+        self.assertNotIn('reserved', compiled.FACTORIES)
+
+        container = DIContainer(None, compiled=self.module_name)
+        instance = container.resolve('keywords')
+        self.assertIsInstance(
+            container._plans['keywords'], di.DICompiledResolvePlan)
+        self.assertIs(getattr(instance, 'from'), container.resolve('config'))
+
+    def test__not_serializable(self):
+        self.assertRaises(
+            di.DIConfigurationError, DIContainer.compile_settings,
+            {'a': {'type': 'mock.Mock', 'args': [object()]}})
+
+
+class ChildContainerFallbackTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.parent = DIContainer(OrderedDict((
+            ('config', {'type': 'mock.Mock', 'singleton': True,
+                        'alias': ['settings']}),
+            ('service', {'type': 'mock.Mock',
+                         'properties': {'source': 'parent'}}),
+        )))
+        self.child = self.parent.create_child_container({
+            'service': {'type': 'mock.Mock',
+                        'properties': {'source': 'child'}},
+        })
+
+    def test__resolve_falls_back_to_parent(self):
+        """
+        Passes if names and aliases missing in the child are resolved by
+        the parent, sharing its singletons.
+        """
+        self.assertIs(
+            self.child.resolve('config'), self.parent.resolve('config'))
+        self.assertIs(
+            self.child.resolve('settings'), self.parent.resolve('config'))
+        self.assertEqual(self.child.resolve('service').source, 'child')
+        self.assertRaises(
+            MissingConfigurationError, self.child.resolve, 'missing')
+
+    def test__resolve_many(self):
+        """
+        Passes if resolve_many returns the instances of the child and the
+        ones of the parent that are not overridden.
+        """
+        instances = list(self.child.resolve_many(mock.Mock))
+        self.assertEqual(len(instances), 2)
+        self.assertEqual(instances[0].source, 'child')
+        self.assertIs(instances[1], self.parent.resolve('config'))
+
+    def test__shares_caches(self):
+        """
+        Passes if the child shares the type cache of the parent and
+        creates its event dispatcher, scopes and value resolvers on
+        demand.
+        """
+        self.assertIs(self.child._type_cache, self.parent._type_cache)
+        self.assertIsNone(self.child._event_dispatcher)
+        self.assertIs(self.child.event_dispatcher.container, self.child)
+        self.assertEqual(self.child._scopes, {})
+        self.assertIsNone(self.child._value_resolvers)
+        self.assertIn('rel', self.child.value_resolvers)
+
+    def test__event_dispatcher(self):
+        """
+        Passes if the child uses its own dispatcher of the parent's
+        types.
+        """
+        containers = []
+
+        class Dispatcher(di.DIEventDispatcher):
+            def after_resolve(self, name, instance, *args, **kwargs):
+                containers.append(self.container)
+
+        parent = DIContainer(
+            {'a': {'type': 'mock.Mock'}},
+            event_dispatcher=[Dispatcher, di.DIEventDispatcher])
+        child = parent.create_child_container({'b': {'type': 'mock.Mock'}})
+        self.assertIsInstance(
+            child.event_dispatcher, di.DICompositeEventDispatcher)
+        parent.resolve('a')
+        child.resolve('b')
+        self.assertEqual(containers, [parent, child])
+
+    def test__resolve_type(self):
+        self.assertIs(self.child.resolve_type('config'), mock.Mock)
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'requires python 3.5')
+    def test__resolve_async_by_type(self):
+        """
+        Passes if resolving by type falls back to the parent in
+        resolve_async, too.
+        """
+        import asyncio
+        child = self.parent.create_child_container({})
+        loop = asyncio.new_event_loop()
+        try:
+            instance = loop.run_until_complete(
+                child.resolve_async(mock.Mock))
+        finally:
+            loop.close()
+        self.assertIs(instance, self.parent.resolve('config'))
+
+    def test__overridden_relations(self):
+        """
+        Passes if configurations of the parent are created in the child
+        with the relations the child overrides, and singletons of the
+        parent are only shared if the child overrides none of their
+        relations.
+        """
+        parent = DIContainer({
+            'db': {'type': 'mock.Mock', 'singleton': True},
+            'repository': {'type': 'mock.Mock', 'singleton': True,
+                           'kwargs': {'db': 'rel:db'}},
+            'service': {'type': 'mock.Mock',
+                        'properties': {'repository': 'rel:repository'}},
+            'config': {'type': 'mock.Mock', 'singleton': True},
+        })
+        child = parent.create_child_container({
+            'db': {'type': 'mock.Mock', 'singleton': True},
+        })
+        db = child.resolve('db')
+        self.assertIsNot(db, parent.resolve('db'))
+        self.assertIs(child.resolve('service').repository.db, db)
+        self.assertIs(child.resolve('repository'), child.resolve('repository'))
+        self.assertIsNot(
+            child.resolve('repository'), parent.resolve('repository'))
+        self.assertIs(parent.resolve('repository').db, parent.resolve('db'))
+        self.assertIs(child.resolve('config'), parent.resolve('config'))
+
+    def test__parent_registration(self):
+        """
+        Passes if configurations registered in the parent after the
+        child resolved are checked for overridden relations again.
+        """
+        parent = DIContainer({
+            'db': {'type': 'mock.Mock'},
+            'repository': {'type': 'mock.Mock'},
+            'service': {'type': 'mock.Mock',
+                        'kwargs': {'repository': 'rel:repository'}},
+        })
+        child = parent.create_child_container({
+            'db': {'type': 'mock.Mock', 'singleton': True},
+        })
+        self.assertIsInstance(child.resolve('service'), mock.Mock)
+        parent.register('repository', {
+            'type': 'mock.Mock', 'kwargs': {'db': 'rel:db'}}, replace=True)
+        self.assertIs(
+            child.resolve('service').repository.db, child.resolve('db'))
+
+    def test__deprecated_value_resolvers(self):
+        """
+        Passes if a child uses the resolvers replaced by the deprecated
+        `value_resolvers` of its parent.
+        """
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            parent = DIContainer({}, value_resolvers={
+                'rel': lambda value: value.upper()})
+        child = parent.create_child_container({
+            'service': {'type': 'mock.Mock', 'kwargs': {'db': 'rel:db'}},
+        })
+        self.assertEqual(child.resolve('service').db, 'REL:DB')
+        self.assertEqual(
+            child.create_child_container({}).resolve('service').db,
+            'REL:DB')
+
+    def test__scopes(self):
+        """
+        Passes if scoped configurations of the parent use the store of
+        the container whose scope is active.
+        """
+        self.parent.register('session', {
+            'type': 'mock.Mock', 'scope': 'context',
+            'dispose_method': 'close'})
+        with self.child.scope():
+            session = self.child.resolve('session')
+            self.assertIs(self.child.resolve('session'), session)
+        session.close.assert_called_once_with()
+
+        with self.parent.scope():
+            self.assertIs(
+                self.child.resolve('session'),
+                self.parent.resolve('session'))
+
+
+class RegisterManyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.container = DIContainer({
+            'existing': {'type': 'mock.Mock', 'alias': ['old']},
+        })
+
+    def test__register_many(self):
+        """
+        Passes if all configurations are registered and indexed.
+        """
+        list(self.container.resolve_many(mock.Mock))
+        self.container.register_many(OrderedDict((
+            ('a', {'type': 'mock.Mock', 'alias': ['first']}),
+            ('b', DIConfig(name='b', type='mock.MagicMock')),
+        )))
+        self.assertIsInstance(self.container.resolve('first'), mock.Mock)
+        self.assertEqual(
+            self.container._names_for_type(mock.Mock),
+            ('existing', 'a', 'b'))
+
+    def test__all_or_nothing(self):
+        """
+        Passes if nothing is registered if one configuration is invalid.
+        """
+        self.assertRaises(
+            KeyError, self.container.register_many,
+            {'a': {'type': 'mock.Mock'}, 'existing': {'type': 'mock.Mock'}})
+        self.assertRaises(
+            di.DIConfigurationError, self.container.register_many,
+            {'a': {'type': 'mock.Mock', 'alias': ['x']},
+             'b': {'type': 'mock.Mock', 'alias': ['x']}})
+        self.assertRaises(
+            ValueError, self.container.register_many,
+            {'a': {'type': 'mock.Mock'}, 'b': {}})
+        self.assertRaises(
+            di.ValidationError, self.container.register_many,
+            {'a': {'type': 'mock.Mock', 'args': ['rel:missing']}},
+            validate=True)
+        self.assertEqual(list(self.container.settings), ['existing'])
+
+    def test__replace(self):
+        """
+        Passes if replaced configurations drop their singletons and old
+        aliases.
+        """
+        self.container.register(
+            'single', {'type': 'mock.Mock', 'singleton': True})
+        single = self.container.resolve('single')
+        self.container.register_many({
+            'single': {'type': 'mock.Mock', 'singleton': True},
+            'existing': {'type': 'mock.Mock', 'alias': ['new']},
+        }, replace=True)
+        self.assertIsNot(self.container.resolve('single'), single)
+        self.assertNotIn('old', self.container.settings.aliases)
+        self.container.resolve('new')
+
+    def test__batch(self):
+        """
+        Passes if the registrations of a batch are applied at its end and
+        the hooks are called once per name.
+        """
+        dispatcher = mock.Mock()
+        self.container.event_dispatcher = dispatcher
+        with self.container.batch():
+            self.container.register('a', {'type': 'mock.Mock'})
+            with self.container.batch():
+                self.container.register('b', {'type': 'mock.Mock'})
+            self.assertRaises(
+                MissingConfigurationError, self.container.resolve, 'a')
+            self.assertRaises(
+                KeyError, self.container.register, 'a', {'type': 'mock.Mock'})
+        self.container.resolve('b')
+        self.assertEqual(dispatcher.before_register.call_count, 2)
+        self.assertEqual(dispatcher.after_register.call_count, 2)
+
+    def test__batch_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.container.batch():
+                self.container.register('a', {'type': 'mock.Mock'})
+                raise RuntimeError()
+        self.assertNotIn('a', self.container.settings)
+
+
+class WarmupTestCase(unittest.TestCase):
+
+    settings = OrderedDict((
+        ('service', {'type': 'mock.Mock',
+                     'assert_type': 'mock.NonCallableMock',
+                     'mixins': ['collections.OrderedDict'],
+                     'args': ['mod:json', di.ReferenceResolver('os.path')],
+                     'kwargs': {'f': 'factory:uuid.uuid4'},
+                     'properties': {'sep': 'attr_lazy:os.path.sep',
+                                    'other': 'rel:other',
+                                    'plain': 'http://example.com'}}),
+        ('other', {'type': 'mock.Mock'}),
+    ))
+
+    def test__targets(self):
+        """
+        Passes if all python names are collected once with the names of
+        the configurations using them.
+        """
+        container = DIContainer(self.settings)
+        targets, names = container._warmup_targets()
+        self.assertEqual(list(targets), [
+            'mock.Mock(collections.OrderedDict)', 'mock.NonCallableMock',
+            'json', 'os.path', 'uuid.uuid4', 'mock.Mock'])
+        self.assertEqual(names['os.path'], ['service'])
+        self.assertEqual(names['mock.Mock'], ['other'])
+
+    def test__warmup(self):
+        """
+        Passes if the types are cached afterwards and factories are not
+        called.
+        """
+        container = DIContainer(self.settings)
+        with mock.patch('uuid.uuid4') as uuid4_mock:
+            container.warmup(workers=2)
+        self.assertFalse(uuid4_mock.called)
+        self.assertIn(('mock.Mock', ()), container._type_cache)
+        self.assertIn(
+            ('mock.Mock', ('collections.OrderedDict',)),
+            container._type_cache)
+
+    def test__errors(self):
+        """
+        Passes if all failures are raised together.
+        """
+        settings = {
+            'a': {'type': 'missing_module_a.Type'},
+            'b': {'type': 'mock.Mock', 'args': ['mod:missing_module_b']},
+        }
+        for workers in (None, 2):
+            with self.assertRaises(di.WarmupError) as context:
+                DIContainer(settings, warmup=workers or True)
+            error = context.exception
+            self.assertEqual(
+                sorted(error.errors),
+                ['missing_module_a.Type', 'missing_module_b'])
+            self.assertEqual(error.names['missing_module_b'], ['b'])
+
+
+class ProxyTestCase(unittest.TestCase):
+
+    def test__resolved_once(self):
+        """
+        Passes if the factory is called on first use only and once.
+        """
+        factory = mock.Mock(return_value=[1, 2])
+        proxy = di.Proxy(factory)
+        self.assertFalse(factory.called)
+        self.assertFalse(proxy.__resolved__)
+        self.assertEqual(len(proxy), 2)
+        self.assertEqual(proxy, [1, 2])
+        self.assertIn(2, proxy)
+        self.assertEqual(factory.call_count, 1)
+        self.assertTrue(proxy.__resolved__)
+
+    def test__threads(self):
+        """
+        Passes if concurrent first uses call the factory once.
+        """
+        import threading
+        import time
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.01)
+            return object()
+
+        proxy = di.Proxy(factory)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(di.unwrap(proxy)))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+
+    def test__forwarding(self):
+        """
+        Passes if attributes, operators and the class are forwarded.
+        """
+        target = mock.Mock()
+        proxy = di.Proxy(lambda: target)
+        proxy.value = 3
+        self.assertEqual(target.value, 3)
+        self.assertIsInstance(proxy, mock.Mock)
+        self.assertIsInstance(proxy, di.Proxy)
+        self.assertIs(di.unwrap(proxy), target)
+        self.assertIs(proxy.__wrapped__, target)
+
+        number = di.Proxy(lambda: 5)
+        self.assertEqual(number + 1, 6)
+        self.assertEqual(1 - number, -4)
+        self.assertEqual(-number, -5)
+        self.assertTrue(number > 4)
+        self.assertEqual(hash(number), hash(5))
+        self.assertEqual('%s' % number, '5')
+        self.assertEqual(di.unwrap(5), 5)
+
+    def test__numeric(self):
+        """
+        Passes if the numeric protocols are forwarded.
+        """
+        number = di.Proxy(lambda: 7)
+        self.assertEqual(divmod(number, 2), (3, 1))
+        self.assertEqual(divmod(9, number), (1, 2))
+        self.assertEqual(round(di.Proxy(lambda: 2.567), 1), 2.6)
+        self.assertEqual(complex(number), 7 + 0j)
+        self.assertEqual(bytes(di.Proxy(lambda: b'ab')), b'ab')
+
+    def test__inplace(self):
+        """
+        Passes if in-place operators change a mutable target and keep
+        the result of an immutable one.
+        """
+        target = [1]
+        proxy = original = di.Proxy(lambda: target)
+        proxy += [2]
+        self.assertIs(proxy, original)
+        self.assertEqual(target, [1, 2])
+
+        number = original = di.Proxy(lambda: 1)
+        number += 1
+        self.assertIs(number, original)
+        self.assertEqual(number, 2)
+
+    @unittest.skipIf(sys.version_info < (3, 6), 'requires os.fspath')
+    def test__fspath(self):
+        """
+        Passes if a proxied path can be used as a path.
+        """
+        self.assertEqual(os.fspath(di.Proxy(lambda: '/tmp')), '/tmp')
+
+    def test__async_protocols(self):
+        """
+        Passes if the awaitable and async context manager protocols are
+        forwarded.
+        """
+        class Target(object):
+            __await__ = mock.Mock()
+            __aenter__ = mock.Mock()
+            __aexit__ = mock.Mock()
+
+        proxy = di.Proxy(Target)
+        self.assertIs(proxy.__await__(), Target.__await__.return_value)
+        self.assertIs(proxy.__aenter__(), Target.__aenter__.return_value)
+        proxy.__aexit__(None, None, None)
+        Target.__aexit__.assert_called_once_with(None, None, None)
+
+    def test__container_default(self):
+        """
+        Passes if containers use the built-in proxy and resolve the
+        proxy type once.
+        """
+        container = DIContainer({'a': {'type': 'mock.Mock'}})
+        with mock.patch.object(
+                container, '_resolve_type',
+                wraps=container._resolve_type) as resolve_type:
+            self.assertIs(container.get_proxy_type(), di.Proxy)
+            container.resolve_lazy('a')
+            container.resolve_lazy('a')
+        self.assertEqual(resolve_type.call_count, 1)
+        self.assertIsInstance(container.resolve_lazy('a'), mock.Mock)
+
+
+class CompactConfigTestCase(unittest.TestCase):
+
+    def test__slots(self):
+        """
+        Passes if configurations have no instance dictionary and share
+        the empty defaults.
+        """
+        conf = DIConfig(type='mock.Mock', kwargs={}, properties={})
+        self.assertFalse(hasattr(conf, '__dict__'))
+        self.assertIs(conf.kwargs, di._EMPTY_DICT)
+        self.assertIs(conf.properties, di._EMPTY_DICT)
+        self.assertIs(DIConfig(type='mock.Mock').kwargs, conf.kwargs)
+        self.assertEqual(conf.kwargs, {})
+
+        user_kwargs = {'a': 1}
+        self.assertIs(
+            DIConfig(type='mock.Mock', kwargs=user_kwargs).kwargs,
+            user_kwargs)
+
+    def test__immutable_defaults(self):
+        """
+        Passes if the shared defaults can not be changed by accident.
+        """
+        conf = DIConfig(type='mock.Mock')
+        with self.assertRaises(TypeError):
+            conf.kwargs['a'] = 1
+        with self.assertRaises(TypeError):
+            conf.properties.update(a=1)
+        copy = conf.kwargs.copy()
+        copy['a'] = 1
+        self.assertEqual(conf.kwargs, {})
+
+    def test__interned_names(self):
+        """
+        Passes if equal type names of different configurations are the
+        same object.
+        """
+        first = DIConfig(type=''.join(['mock.', 'Mock']))
+        second = DIConfig(type=''.join(['mock', '.Mock']))
+        self.assertIs(first.type, second.type)
+
+    def test__unknown_option(self):
+        """
+        Passes if unknown options raise a TypeError.
+        """
+        with self.assertRaises(TypeError):
+            DIConfig(type='mock.Mock', unknown=True)
+
+    def test__pickle(self):
+        """
+        Passes if configurations with shared defaults can be pickled.
+        """
+        import pickle
+        conf = DIConfig(type='mock.Mock', args=[1])
+        loaded = pickle.loads(pickle.dumps(conf))
+        self.assertEqual(loaded, conf)
+        self.assertIs(loaded.kwargs, di._EMPTY_DICT)
+
+
+class SingletonStoreTestCase(unittest.TestCase):
+
+    def get_container(self, store, count=3):
+        settings = dict(
+            ('customer_%s' % i, {
+                'type': 'mock.Mock', 'singleton': True, 'evictable': True})
+            for i in range(count))
+        settings['pinned'] = {'type': 'mock.Mock', 'singleton': True}
+        cleared = []
+
+        class Dispatcher(di.DIEventDispatcher):
+
+            def after_clear(self, name):
+                cleared.append(name)
+
+        container = DIContainer(
+            settings, singleton_store=store, event_dispatcher=Dispatcher)
+        return container, cleared
+
+    def test__evictable_requires_singleton(self):
+        """
+        Passes if `evictable` can not be used without `singleton`.
+        """
+        with self.assertRaises(ValueError):
+            DIConfig(type='mock.Mock', evictable=True)
+
+    def test__default_store(self):
+        """
+        Passes if the default store keeps all instances.
+        """
+        container = DIContainer({'a': {
+            'type': 'mock.Mock', 'singleton': True, 'evictable': True}})
+        self.assertIsInstance(container.singletons, di.DISingletonStore)
+        self.assertIs(container.resolve('a'), container.resolve('a'))
+        container.clear()
+        self.assertEqual(len(container.singletons), 0)
+
+    def test__lru(self):
+        """
+        Passes if the least recently used evictable instance is evicted
+        and reported as `after_clear` event.
+        """
+        container, cleared = self.get_container(
+            di.LRUSingletonStore(max_size=2))
+        pinned = container.resolve('pinned')
+        first = container.resolve('customer_0')
+        container.resolve('customer_1')
+        # customer_0 becomes the most recently used.
+        self.assertIs(container.resolve('customer_0'), first)
+        container.resolve('customer_2')
+
+        self.assertNotIn('customer_1', container.singletons)
+        self.assertIn('customer_0', container.singletons)
+        self.assertIs(container.resolve('pinned'), pinned)
+        self.assertEqual(cleared, ['customer_1'])
+
+        # evicted instances are created again.
+        container.resolve('customer_1')
+        self.assertIn('customer_1', container.singletons)
+        self.assertNotIn('customer_0', container.singletons)
+        self.assertEqual(cleared, ['customer_1', 'customer_0'])
+
+    def test__weak(self):
+        """
+        Passes if evictable instances are kept as long as they are used.
+        """
+        import gc
+        container, cleared = self.get_container(di.WeakSingletonStore)
+        instance = container.resolve('customer_0')
+        self.assertIs(container.resolve('customer_0'), instance)
+        self.assertIn('customer_0', container.singletons)
+
+        del instance
+        gc.collect()
+        self.assertNotIn('customer_0', container.singletons)
+        self.assertEqual(cleared, ['customer_0'])
+
+        # values that can not be weakly referenced are kept.
+        container.register('number', {
+            'type': 'builtins.int' if di.py3 else '__builtin__.int',
+            'singleton': True, 'evictable': True})
+        container.resolve('number')
+        gc.collect()
+        self.assertIn('number', container.singletons)
+
+        container.resolve('pinned')
+        gc.collect()
+        self.assertIn('pinned', container.singletons)
+
+
+class ForkTestCase(unittest.TestCase):
+
+    def get_container(self):
+        return DIContainer({
+            'config': {
+                'type': 'mock.Mock', 'singleton': True, 'fork_safe': True},
+            'connection': {'type': 'mock.Mock', 'singleton': True},
+            'parser': {'type': 'mock.Mock', 'pool': True},
+            'thread_connection': {'type': 'mock.Mock', 'scope': 'thread'},
+        })
+
+    def test__fork_safe_requires_singleton(self):
+        """
+        Passes if `fork_safe` can not be used without `singleton`.
+        """
+        with self.assertRaises(ValueError):
+            DIConfig(type='mock.Mock', fork_safe=True)
+
+    def test__prefork(self):
+        """
+        Passes if only the fork safe singletons are created.
+        """
+        container = self.get_container()
+        with mock.patch.object(di.gc, 'freeze', create=True) as freeze:
+            self.assertEqual(container.prefork(freeze=True), ['config'])
+        freeze.assert_called_once_with()
+        self.assertIn('config', container.singletons)
+        self.assertNotIn('connection', container.singletons)
+        self.assertIn(container, di._fork_containers)
+
+    def test__after_fork(self):
+        """
+        Passes if the other singletons and the pools are dropped and
+        created again.
+        """
+        container = self.get_container()
+        config = container.resolve('config')
+        connection = container.resolve('connection')
+        container.release('parser', container.acquire('parser'))
+        thread_connection = container.resolve('thread_connection')
+        lock = container._locks_lock
+
+        container.after_fork()
+        self.assertIs(container.resolve('config'), config)
+        self.assertIsNot(container.resolve('connection'), connection)
+        self.assertIsNot(
+            container.resolve('thread_connection'), thread_connection)
+        self.assertEqual(container._pools, {})
+        self.assertIsNot(container._locks_lock, lock)
+
+    @unittest.skipUnless(
+        hasattr(os, 'register_at_fork'), 'requires os.register_at_fork')
+    def test__fork(self):
+        """
+        Passes if a forked process drops the per process singletons.
+        """
+        container = self.get_container()
+        container.prefork()
+        config = container.resolve('config')
+        connection = container.resolve('connection')
+
+        pid = os.fork()
+        if pid == 0:
+            same = container.resolve('config') is config and \
+                container.resolve('connection') is not connection
+            os._exit(0 if same else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        # the parent keeps its singletons.
+        self.assertIs(container.resolve('connection'), connection)